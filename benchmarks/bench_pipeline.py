@@ -0,0 +1,205 @@
+"""Замер конвейера опрос -> разбор -> уведомление на локальных заглушках.
+
+Пример: python benchmarks/bench_pipeline.py --subscriptions 1 100 10000
+--output before.json, затем после изменений тот же запуск с
+--compare before.json.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import get_context
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import homework  # noqa: E402
+from fakes import FakeBot, FakePracticumServer  # noqa: E402
+from limits import TokenBucket  # noqa: E402
+from subscriptions import SubscriptionRegistry  # noqa: E402
+
+COMPARED = ('polls_per_second', 'poll_p50', 'poll_p99', 'fetch_p50',
+            'fetch_p99', 'max_rss_kb')
+ROW = ('{subscriptions:>8} {polls_per_second:>10.1f} {poll_p50:>9.4f} '
+       '{poll_p99:>9.4f} {fetch_p50:>9.4f} {fetch_p99:>9.4f} '
+       '{sent:>8} {max_rss_kb:>10}')
+HEADER = (f'{"subs":>8} {"polls/s":>10} {"poll p50":>9} {"poll p99":>9} '
+          f'{"fetch p50":>9} {"fetch p99":>9} {"sent":>8} {"rss, KB":>10}')
+DELTA = ('{subscriptions:>8} {metric:<18} {old:>12.4f} {new:>12.4f} '
+         '{change:>+8.1%}')
+
+
+class TimedEngine(homework.PollingEngine):
+    """Движок, записывающий длительность каждого опроса."""
+
+    def __init__(self, *args, **kwargs):
+        """Движок с пустым списком замеров."""
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def poll(self, subscription, semaphore, deadline=None):
+        """Опрос с замером времени, включая ожидание в очереди."""
+        start = time.perf_counter()
+        try:
+            return await super().poll(subscription, semaphore, deadline)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной выборке."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timed_fetch(latencies, fetch):
+    """Обёртка запроса к API с замером длительности."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_scenario(settings):
+    """Прогон одного сценария, возвращает словарь результатов."""
+    server = FakePracticumServer(
+        homeworks=settings['homeworks'],
+        latency=settings['api_latency'],
+        error_rate=settings['api_errors'],
+        change_rate=settings['change_rate'],
+    ).start()
+    homework.ENDPOINT = server.url
+    fetch_latencies = []
+    homework.fetch_api_answer = timed_fetch(
+        fetch_latencies, homework.fetch_api_answer
+    )
+    registry = SubscriptionRegistry()
+    for number in range(settings['subscriptions']):
+        registry.add(f'token{number}', number, 0)
+    bot = FakeBot(settings['bot_latency'], settings['bot_errors'])
+    concurrency = settings['concurrency']
+    engine = TimedEngine(
+        bot, registry,
+        concurrency=concurrency,
+        session=homework.create_session(
+            pool_size=concurrency, retries=settings['retries']
+        ),
+        outbox=homework.create_outbox(
+            bot, chat_interval=0, rate=10 ** 9, backoff=0
+        ),
+        limiter=TokenBucket(10 ** 9, 10 ** 9),
+    )
+    start = time.perf_counter()
+    for _ in range(settings['cycles']):
+        engine.run_cycle()
+    elapsed = time.perf_counter() - start
+    engine.outbox.join()
+    drained = time.perf_counter() - start
+    engine.close()
+    server.stop()
+    polls = settings['subscriptions'] * settings['cycles']
+    return dict(
+        settings,
+        polls=polls,
+        elapsed=elapsed,
+        drained=drained,
+        polls_per_second=polls / elapsed,
+        poll_p50=percentile(engine.latencies, 0.5),
+        poll_p99=percentile(engine.latencies, 0.99),
+        fetch_p50=percentile(fetch_latencies, 0.5),
+        fetch_p99=percentile(fetch_latencies, 0.99),
+        unchanged=engine.stats['unchanged'],
+        sent=bot.sent,
+        send_failed=engine.outbox.stats['failed'],
+        breaker=engine.breaker.metrics(),
+        max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
+
+
+def current_commit():
+    """Хэш текущего коммита, если доступен git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, results):
+    """Печать изменений относительно сохранённого прогона."""
+    with open(old_path, encoding='utf-8') as file:
+        old_results = {
+            result['subscriptions']: result
+            for result in json.load(file)['results']
+        }
+    for result in results:
+        old = old_results.get(result['subscriptions'])
+        if old is None:
+            continue
+        for metric in COMPARED:
+            change = (
+                (result[metric] - old[metric]) / old[metric]
+                if old[metric] else 0.0
+            )
+            print(DELTA.format(
+                subscriptions=result['subscriptions'], metric=metric,
+                old=old[metric], new=result[metric], change=change
+            ))
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscriptions', type=int, nargs='+',
+                        default=[1, 100, 10000])
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--homeworks', type=int, default=1)
+    parser.add_argument('--api-latency', type=float, default=0.0)
+    parser.add_argument('--api-errors', type=float, default=0.0)
+    parser.add_argument('--change-rate', type=float, default=0.1)
+    parser.add_argument('--bot-latency', type=float, default=0.0)
+    parser.add_argument('--bot-errors', type=float, default=0.0)
+    parser.add_argument('--retries', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Прогон всех сценариев, каждый в отдельном процессе."""
+    args = parse_args(argv)
+    common = {
+        name: value for name, value in vars(args).items()
+        if name not in ('subscriptions', 'output', 'compare')
+    }
+    context = get_context('fork')
+    results = []
+    print(HEADER)
+    for subscriptions in args.subscriptions:
+        with context.Pool(1) as pool:
+            result = pool.apply(
+                run_scenario, (dict(common, subscriptions=subscriptions),)
+            )
+        results.append(result)
+        print(ROW.format(**result))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'commit': current_commit(), 'results': results},
+                      file, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Прогон записанных ответов API на виртуальных часах.
+
+Запись делается при работе бота с RECORD_FILE=recording.jsonl.gz. Без
+записи можно сгенерировать синтетическую: --synthesize 7 даёт неделю
+опросов. Пример:
+python benchmarks/bench_replay.py --synthesize 7 --retry-time 300 1200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import homework  # noqa: E402
+from replay import (RecordingSession, SimulatedClock, drive,  # noqa: E402
+                    read_records)
+
+START = 1700000000
+RECORD_INTERVAL = 600
+ROW = ('{retry_time:>10} {concurrency:>5} {requests:>9} {messages:>9} '
+       '{repeated:>9} {virtual_h:>10.1f} {wall:>8.2f}')
+HEADER = (f'{"retry_time":>10} {"conc":>5} {"requests":>9} '
+          f'{"messages":>9} {"repeated":>9} {"virtual_h":>10} {"wall_s":>8}')
+
+
+class SyntheticResponse:
+    """Ответ синтетического API."""
+
+    def __init__(self, status_code, content):
+        """Ответ со статусом и телом."""
+        self.status_code = status_code
+        self.headers = {}
+        self.content = content
+
+
+class SyntheticSession:
+    """API, где статус работы иногда меняется, а иногда бывает 502."""
+
+    def __init__(self, clock, change_rate=0.05, error_rate=0.01, seed=0):
+        """Сессия с долей изменений и ошибок на каждый запрос."""
+        self.clock = clock
+        self.change_rate = change_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.versions = Counter()
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Ответ для токена из заголовка."""
+        token = headers['Authorization']
+        if self.random.random() < self.error_rate:
+            return SyntheticResponse(502, b'{}')
+        if self.random.random() < self.change_rate:
+            self.versions[token] += 1
+        body = {
+            'homeworks': [{
+                'id': 1,
+                'homework_name': 'hw',
+                'status': homework.STATUS_NAMES[self.versions[token] % 3],
+            }],
+            'current_date': int(self.clock.time()),
+        }
+        return SyntheticResponse(200, json.dumps(body).encode())
+
+    def close(self):
+        """Закрытие не требуется."""
+
+
+def synthesize(path, days, tokens):
+    """Синтетическая запись: опрос tokens токенов раз в 10 минут."""
+    clock = SimulatedClock(START)
+    session = RecordingSession(
+        SyntheticSession(clock), path, clock=clock.time
+    )
+    while clock.time() < START + days * 24 * 3600:
+        for number in range(tokens):
+            session.get(
+                homework.ENDPOINT,
+                headers={'Authorization': f'OAuth token{number}'},
+                params={'from_date': 0}
+            )
+        clock.sleep(RECORD_INTERVAL)
+    session.close()
+
+
+def repeated(sent):
+    """Сколько раз чату подряд ушло одно и то же сообщение."""
+    last = {}
+    count = 0
+    for _, chat_id, message in sent:
+        count += last.get(chat_id) == message
+        last[chat_id] = message
+    return count
+
+
+def replay(records, retry_time, concurrency, seed=0):
+    """Один прогон записи с интервалом опроса и параллельностью."""
+    clock = SimulatedClock(records[0]['t'])
+    engine = homework.create_replay_engine(
+        records, clock, concurrency=concurrency,
+        scheduler=homework.create_scheduler(
+            clock=clock.monotonic, idle_interval=retry_time,
+            max_interval=retry_time, rand=random.Random(seed).random
+        )
+    )
+    start = time.perf_counter()
+    drive(engine, clock, records[-1]['t'])
+    wall = time.perf_counter() - start
+    engine.close()
+    return dict(
+        retry_time=retry_time,
+        concurrency=concurrency,
+        requests=engine.session.requests,
+        messages=len(engine.outbox.sent),
+        repeated=repeated(engine.outbox.sent),
+        virtual_h=(records[-1]['t'] - records[0]['t']) / 3600,
+        wall=wall,
+    )
+
+
+def main(argv=None):
+    """Прогоны записи для всех сочетаний настроек."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--synthesize', type=float, metavar='DAYS')
+    parser.add_argument('--tokens', type=int, default=10)
+    parser.add_argument('--retry-time', type=int, nargs='+', default=[600])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.synthesize:
+        path = os.path.join(tempfile.mkdtemp(), 'recording.jsonl.gz')
+        synthesize(path, args.synthesize, args.tokens)
+    elif args.recording:
+        path = args.recording
+    else:
+        parser.error('нужен файл записи или --synthesize')
+    records = list(read_records(path))
+    print(HEADER)
+    for retry_time in args.retry_time:
+        for concurrency in args.concurrency:
+            print(ROW.format(
+                **replay(records, retry_time, concurrency, args.seed)
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Время запуска: импорт homework и время до первого опроса API.
+
+Каждый замер выполняется в новом интерпретаторе. Пример:
+python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from fakes import FakePracticumServer  # noqa: E402
+
+ROW = '{metric:<12} {median:>10.4f} {best:>10.4f} {worst:>10.4f}'
+HEADER = f'{"metric, s":<12} {"median":>10} {"best":>10} {"worst":>10}'
+
+
+class NullBot:
+    """Бот, который ничего не отправляет."""
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Отправка без сети."""
+
+
+def first_poll(url):
+    """Импорт и первый опрос в текущем процессе, печать замеров."""
+    start = time.perf_counter()
+    import homework
+    imported = time.perf_counter()
+    homework.ENDPOINT = url
+    registry = homework.SubscriptionRegistry()
+    registry.add('token', 1, 0)
+    engine = homework.PollingEngine(NullBot(), registry)
+    engine.run_cycle()
+    polled = time.perf_counter()
+    engine.close()
+    print(json.dumps({
+        'import': imported - start,
+        'first_poll': polled - start,
+    }))
+
+
+def measure(url):
+    """Один запуск нового интерпретатора до первого опроса."""
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', url],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    """Серия запусков и печать медианы, лучшего и худшего времени."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child')
+    args = parser.parse_args(argv)
+    if args.child:
+        return first_poll(args.child)
+    server = FakePracticumServer().start()
+    try:
+        results = [measure(server.url) for _ in range(args.runs)]
+    finally:
+        server.stop()
+    print(HEADER)
+    for metric in ('import', 'first_poll', 'process'):
+        values = [result[metric] for result in results]
+        print(ROW.format(
+            metric=metric, median=statistics.median(values),
+            best=min(values), worst=max(values)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Память состояния подписок: компактные записи против словарей строк.
+
+Пример: python benchmarks/bench_state.py --subscriptions 100000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import homework  # noqa: E402
+from subscriptions import SubscriptionRegistry  # noqa: E402
+
+LESSONS = 20
+ROW = '{layout:<8} {total_mb:>10.1f} {per_subscription:>10.0f}'
+HEADER = f'{"layout":<8} {"MB":>10} {"B/sub":>10}'
+
+
+def answer(number, homeworks):
+    """Тело ответа API подписки: каждый раз новые строки, как от json."""
+    return json.loads(json.dumps({
+        'homeworks': [
+            {
+                'id': number * homeworks + index,
+                'homework_name': f'Спринт {(number + index) % LESSONS}',
+                'status': homework.STATUS_NAMES[(number + index) % 3],
+            }
+            for index in range(homeworks)
+        ],
+        'current_date': 1700000000 + number,
+    }))
+
+
+def build_dicts(subscriptions, homeworks):
+    """Наивное состояние: словари со статусами и текстом сообщения."""
+    state = {}
+    for number in range(subscriptions):
+        response = answer(number, homeworks)
+        statuses = {}
+        last_message = None
+        for item in reversed(response['homeworks']):
+            statuses[str(item['id'])] = item['status']
+            last_message = homework.parse_status(item)
+        state[(f'token{number:032}', number)] = {
+            'token': f'token{number:032}',
+            'chat_id': number,
+            'current_timestamp': response['current_date'],
+            'last_message': last_message,
+            'last_error': None,
+            'statuses': statuses,
+        }
+    return state
+
+
+def build_compact(subscriptions, homeworks):
+    """Компактное состояние: Subscription со слотами и кодами статусов."""
+    registry = SubscriptionRegistry()
+    for number in range(subscriptions):
+        response = answer(number, homeworks)
+        subscription = registry.add(f'token{number:032}', number)
+        for key, code, name in homework.diff_statuses(
+            subscription.statuses, response['homeworks']
+        ):
+            subscription.statuses[key] = code
+            subscription.last_name = name
+            subscription.last_status = code
+        subscription.current_timestamp = response['current_date']
+    return registry
+
+
+def measure(build, subscriptions, homeworks):
+    """Память, занятая построенным состоянием, в байтах."""
+    gc.collect()
+    tracemalloc.start()
+    state = build(subscriptions, homeworks)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del state
+    return size
+
+
+def main(argv=None):
+    """Замер обоих вариантов и печать таблицы."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscriptions', type=int, default=100000)
+    parser.add_argument('--homeworks', type=int, default=3)
+    args = parser.parse_args(argv)
+    print(HEADER)
+    for layout, build in (('dicts', build_dicts),
+                          ('compact', build_compact)):
+        size = measure(build, args.subscriptions, args.homeworks)
+        print(ROW.format(
+            layout=layout, total_mb=size / 2 ** 20,
+            per_subscription=size / args.subscriptions
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from telegram.error import NetworkError
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+OLD_DATE = '2020-02-13T14:40:57Z'
+
+
+class FakePracticumServer:
+    """Локальная замена API Практикума для нагрузочных замеров.
+
+    Отвечает списком из homeworks работ на каждый токен, с вероятностью
+    change_rate меняет статус первой работы, с вероятностью error_rate
+    отвечает 500, перед ответом ждёт latency секунд.
+    """
+
+    def __init__(self, homeworks=1, latency=0.0, error_rate=0.0,
+                 change_rate=0.0, seed=0):
+        """Сервер с заданным размером ответа, задержкой и долей ошибок."""
+        self.homeworks = homeworks
+        self.latency = latency
+        self.error_rate = error_rate
+        self.change_rate = change_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Адрес эндпоинта статусов работ."""
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/api/user_api/homework_statuses/'
+
+    def start(self):
+        """Запуск сервера в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановка сервера."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, token, from_date):
+        """Код ответа и тело для токена."""
+        with self._lock:
+            self.requests += 1
+            if self.random.random() < self.error_rate:
+                return 500, b'{}'
+            version, changed_at = self._versions.get(token, (0, OLD_DATE))
+            if self.random.random() < self.change_rate:
+                version += 1
+                changed_at = time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime()
+                )
+                self._versions[token] = version, changed_at
+        homeworks = [
+            {
+                'id': number,
+                'homework_name': f'{token}_hw{number}',
+                'status': STATUSES[(version if number == 0 else 1) % 3],
+                'reviewer_comment': 'Комментарий ревьюера',
+                'date_updated': changed_at if number == 0 else OLD_DATE,
+                'lesson_name': f'Урок {number}',
+            }
+            for number in range(self.homeworks)
+        ]
+        body = {'homeworks': homeworks, 'current_date': int(time.time())}
+        return 200, json.dumps(body, ensure_ascii=False).encode()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                token = self.headers.get('Authorization', '').split(' ')[-1]
+                query = parse_qs(urlparse(self.path).query)
+                status, body = server.answer(
+                    token, query.get('from_date', ['0'])[0]
+                )
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeBot:
+    """Замена telegram.Bot с задержкой и долей сетевых ошибок."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        """Бот с задержкой отправки и вероятностью ошибки."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Имитация отправки сообщения."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.random.random() < self.error_rate:
+                raise NetworkError('fake network error')
+            self.sent += 1
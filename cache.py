@@ -0,0 +1,214 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL
+)
+'''
+SELECT_RESPONSE = ('SELECT expires, status, headers, content '
+                   'FROM response_cache WHERE key = ?')
+UPSERT_RESPONSE = '''
+INSERT INTO response_cache (key, expires, status, headers, content)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    expires = excluded.expires,
+    status = excluded.status,
+    headers = excluded.headers,
+    content = excluded.content
+'''
+DELETE_EXPIRED = 'DELETE FROM response_cache WHERE expires <= ?'
+VALIDATORS = ('ETag', 'Last-Modified')
+PURGE_EVERY = 1000
+
+
+def cache_key(token, from_date):
+    """Ключ ответа: хэш токена и from_date, без токена в открытом виде."""
+    return f'{hashlib.sha256(token.encode()).hexdigest()}:{from_date}'
+
+
+class CachedResponse:
+    """Ответ API в кэше: статус, валидаторы и тело."""
+
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        """Ответ со статусом, заголовками и телом в байтах."""
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @classmethod
+    def from_response(cls, response):
+        """Копия ответа requests без лишних заголовков."""
+        return cls(response.status_code, {
+            name: response.headers[name]
+            for name in VALIDATORS if name in response.headers
+        }, response.content)
+
+    def for_request(self, headers):
+        """Ответ для запроса: 304, если у запроса тот же ETag."""
+        etag = self.headers.get('ETag')
+        if etag is not None and headers.get('If-None-Match') == etag:
+            return CachedResponse(304, self.headers, b'')
+        return self
+
+    def json(self):
+        """Разбор тела как JSON."""
+        return json.loads(self.content)
+
+
+class SQLiteResponseCache:
+    """Общий кэш ответов в файле SQLite для нескольких процессов."""
+
+    def __init__(self, path, clock=time.time):
+        """Открытие базы и создание таблицы кэша."""
+        self.clock = clock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(CREATE_TABLE)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key):
+        """Ответ и срок его годности или None."""
+        with self._lock:
+            row = self.connection.execute(SELECT_RESPONSE, (key,)).fetchone()
+        if row is None or row[0] <= self.clock():
+            return None
+        expires, status, headers, content = row
+        return CachedResponse(status, json.loads(headers), content), expires
+
+    def put(self, key, response, expires):
+        """Запись ответа до момента expires."""
+        with self._lock, self.connection:
+            self.connection.execute(UPSERT_RESPONSE, (
+                key, expires, response.status_code,
+                json.dumps(response.headers), response.content
+            ))
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.connection.execute(DELETE_EXPIRED, (self.clock(),))
+
+    def close(self):
+        """Закрытие соединения."""
+        self.connection.close()
+
+
+class ResponseCache:
+    """Кэш ответов API со сроком годности ttl.
+
+    Первый уровень - LRU в памяти процесса не больше max_entries
+    записей, второй, необязательный, - общий кэш shared с методами
+    get(key) -> (ответ, срок) | None и put(key, ответ, срок), например
+    SQLiteResponseCache или клиент Redis с той же обёрткой.
+    """
+
+    def __init__(self, ttl, max_entries=10000, shared=None,
+                 clock=time.time):
+        """Кэш со сроком годности в секундах и пределом записей."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.clock = clock
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Неистёкший ответ из памяти или общего кэша, иначе None."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            self._entries.pop(key, None)
+        entry = None if self.shared is None else self.shared.get(key)
+        with self._lock:
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['shared_hits'] += 1
+            self._store(key, *entry)
+        return entry[0]
+
+    def peek(self, key):
+        """Неистёкший ответ из памяти процесса без учёта в статистике."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[1] <= self.clock():
+            return None
+        return entry[0]
+
+    def put(self, key, response):
+        """Запись ответа в оба уровня на ttl секунд."""
+        expires = self.clock() + self.ttl
+        with self._lock:
+            self._store(key, response, expires)
+        if self.shared is not None:
+            self.shared.put(key, response, expires)
+
+    def close(self):
+        """Закрытие общего кэша."""
+        if self.shared is not None:
+            self.shared.close()
+
+    def __len__(self):
+        """Число записей в памяти процесса."""
+        return len(self._entries)
+
+    def _store(self, key, response, expires):
+        self._entries[key] = (response, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых вызовов в один.
+
+    Пока вызов по ключу выполняется, остальные вызовы с тем же ключом
+    ждут его и получают тот же результат или то же исключение.
+    """
+
+    def __init__(self):
+        """Пустой набор выполняющихся вызовов."""
+        self.stats = {'leaders': 0, 'shared': 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """Результат function() - своего или уже выполняющегося вызова."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = [threading.Event(), None, None]
+                self.stats['leaders'] += 1
+            else:
+                self.stats['shared'] += 1
+        if not leader:
+            flight[0].wait()
+        else:
+            try:
+                flight[1] = function()
+            except Exception as error:
+                flight[2] = error
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight[0].set()
+        if flight[2] is not None:
+            raise flight[2]
+        return flight[1]
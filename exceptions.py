@@ -8,3 +8,21 @@ class MessageError(Exception):
     """Ошибка отправки сообщения."""
 
     pass
+
+
+class CircuitOpenError(Exception):
+    """Запрос к API Яндекса отклонён разомкнутым предохранителем."""
+
+    pass
+
+
+class DeadlineExceeded(Exception):
+    """Опрос не уложился в оставшееся время цикла и отложен."""
+
+    pass
+
+
+class ClientError(ServerError):
+    """API Яндекса отклонил запрос подписки: статус 4xx."""
+
+    pass
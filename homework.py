@@ -1,33 +1,149 @@
+import asyncio
+import hashlib
+import itertools
 import logging
 import os
-import time
+import queue
+import random
+import re
+import signal
 import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from http import HTTPStatus
 
-import requests
-from dotenv import load_dotenv
-from telegram import Bot
-from telegram.error import TelegramError
+import metrics
+from cache import (CachedResponse, ResponseCache, SingleFlight,
+                   SQLiteResponseCache, cache_key)
+from jsonstream import JsonReader
+from exceptions import (CircuitOpenError, ClientError, DeadlineExceeded,
+                        MessageError, ServerError)
+from limits import CircuitBreaker, TokenBucket
+from log_config import setup_logging
+from outbox import Outbox
+from replay import (InlineExecutor, RecordingSession, ReplayOutbox,
+                    ReplaySession)
+from scheduler import AdaptiveScheduler
+from sharding import RELOAD, HashRing, Supervisor
+from sinks import Fanout, FileSink, WebhookSink
+from state import MemoryStateStore, create_state_store
+from subscriptions import SubscriptionRegistry
+from suppression import ErrorSuppressor, fingerprint
+from templates import MessageCatalog, check_templates, select_catalog
 
-from exceptions import ServerError, MessageError
+if __name__ == '__main__':
+    from dotenv import load_dotenv
 
-load_dotenv()
+    load_dotenv()
 
 logger = logging.getLogger(__name__)
-handler = logging.StreamHandler(sys.stdout)
-logger.addHandler(handler)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+STATE_DB = os.getenv('STATE_DB')
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+LOG_FILE = os.getenv(
+    'LOG_FILE', os.path.join(os.path.expanduser('~'), 'main.log')
+)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_JSON = os.getenv('LOG_FORMAT', 'text') == 'json'
+LOG_QUEUE = os.getenv('LOG_QUEUE', '1') == '1'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 5))
+LOG_REPEAT_WINDOW = float(os.getenv('LOG_REPEAT_WINDOW', 60))
 TOKENS = ['PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID']
+REGISTRY_TOKENS = ['TELEGRAM_TOKEN']
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 RETRY_TIME = 600
+POLL_MIN_INTERVAL = int(os.getenv('POLL_MIN_INTERVAL', 60))
+POLL_REVIEWING_INTERVAL = int(os.getenv('POLL_REVIEWING_INTERVAL', 180))
+POLL_MAX_INTERVAL = int(os.getenv('POLL_MAX_INTERVAL', 3600))
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))
+POLL_BUDGET = int(os.getenv('POLL_BUDGET', 0))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 4))
+TELEGRAM_RATE = float(os.getenv('TELEGRAM_RATE', 30))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', 1))
+SEND_RETRIES = int(os.getenv('SEND_RETRIES', 3))
+SEND_BACKOFF = float(os.getenv('SEND_BACKOFF', 1))
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 10))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 30))
+SEND_TIMEOUT = float(os.getenv('SEND_TIMEOUT', 10))
+CYCLE_BUDGET = float(os.getenv('CYCLE_BUDGET', 0))
+API_RATE = float(os.getenv('API_RATE', 10))
+API_BURST = int(os.getenv('API_BURST', 20))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', 60))
+BREAKER_PROBES = int(os.getenv('BREAKER_PROBES', 1))
+POOL_SIZE = int(os.getenv('POOL_SIZE', POLL_CONCURRENCY))
+API_RETRIES = int(os.getenv('API_RETRIES', 3))
+API_BACKOFF = float(os.getenv('API_BACKOFF', 0.5))
+RETRY_STATUSES = (500, 502, 503, 504)
+SHARDS = int(os.getenv('SHARDS', 1))
+DYNO_COUNT = int(os.getenv('DYNO_COUNT', 1))
+DYNO_INDEX = int(os.getenv('DYNO_INDEX', 0))
+HEARTBEAT_INTERVAL = float(os.getenv('HEARTBEAT_INTERVAL', 10))
+HEARTBEAT_TIMEOUT = float(os.getenv('HEARTBEAT_TIMEOUT', 300))
+SHARD_BATCH = int(os.getenv('SHARD_BATCH', 100))
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+ERROR_WINDOW = float(os.getenv('ERROR_WINDOW', 3600))
+ERROR_TRACKED_LIMIT = int(os.getenv('ERROR_TRACKED_LIMIT', 100000))
+BACKFILL_PERIOD = int(os.getenv('BACKFILL_PERIOD', 0))
+BACKFILL_WINDOW = int(os.getenv('BACKFILL_WINDOW', 0))
+BACKFILL_BATCH = int(os.getenv('BACKFILL_BATCH', 10))
+BACKFILL_PAUSE = float(os.getenv('BACKFILL_PAUSE', 1))
+NOTIFY_SINKS = os.getenv('NOTIFY_SINKS', 'telegram').split(',')
+NOTIFY_WEBHOOK_URL = os.getenv('NOTIFY_WEBHOOK_URL')
+NOTIFY_WEBHOOK_INTERVAL = float(os.getenv('NOTIFY_WEBHOOK_INTERVAL', 5))
+NOTIFY_WEBHOOK_RATE = float(os.getenv('NOTIFY_WEBHOOK_RATE', 10))
+NOTIFY_FILE = os.getenv('NOTIFY_FILE', 'notifications.jsonl')
+NOTIFY_FILE_INTERVAL = float(os.getenv('NOTIFY_FILE_INTERVAL', 0))
+RECORD_FILE = os.getenv('RECORD_FILE')
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 0))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 10000))
+RESPONSE_CACHE_DB = os.getenv('RESPONSE_CACHE_DB')
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+CACHE_FROM_ENV = object()
+TUNABLES = {
+    'POLL_MIN_INTERVAL': int,
+    'POLL_REVIEWING_INTERVAL': int,
+    'POLL_MAX_INTERVAL': int,
+    'POLL_JITTER': float,
+    'POLL_BUDGET': int,
+    'POLL_CONCURRENCY': int,
+    'API_TIMEOUT': float,
+    'CYCLE_BUDGET': float,
+    'API_RATE': float,
+    'API_BURST': int,
+}
+BOT_UPDATES = os.getenv('BOT_UPDATES')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PORT = int(os.getenv('PORT', 8443))
+STATUS_MAX_AGE = float(os.getenv('STATUS_MAX_AGE', 300))
+STREAM_PARSING = os.getenv('STREAM_PARSING', '1') == '1'
+LOCALE = os.getenv('LOCALE', 'ru')
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+ANSWER_STATUSES = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+CLIENT_STATUSES = frozenset(range(400, 500)) - {HTTPStatus.TOO_MANY_REQUESTS}
+MESSAGE_LIMIT = 4096
+MESSAGE_SEPARATOR = '\n\n'
+CURRENT_DATE_PATTERN = re.compile(rb'"current_date"\s*:\s*(\d+)')
+REVIEWING = 'reviewing'
 VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_NAMES = tuple(VERDICTS)
+STATUS_CODES = {status: code for code, status in enumerate(STATUS_NAMES)}
+REVIEWING_CODE = STATUS_CODES[REVIEWING]
 SEND_MESSAGE = '"{message}": cообщение отправлено в чат!'
 ERROR_SEND = ('Сбой при отправке сообщения: {error}. '
               'Сообщение: "{message}" не доставлено!')
@@ -39,32 +155,305 @@ RESPONSE_ERROR = ('Неверный тип данных: {type_response}. '
                   'Ожидался словарь.')
 HOMEWORKS_ERROR = ('Неверный тип данных: {type_homeworks}. '
                    'Ожидался список.')
+DEADLINE_EXCEEDED = ('Опрос отложен до следующего цикла: бюджет цикла '
+                     'исчерпан. Параметры запроса: {url}, {params}')
+CYCLE_OVERRUN = ('Цикл опроса не уложился в бюджет {budget} c: прошло '
+                 '{elapsed} c, отложено опросов {deferred}')
+API_TIMEOUT_ERROR = ('Превышено время ожидания ответа API: {timeout} c. '
+                     'Параметры запроса: {url}, {params}')
 KEYS_ERROR = 'В словаре нет ключа: homeworks'
-VERDICT_ERROR = 'Неожиданное принятое значение, отсутствует статус: {status}}'
+VERDICT_ERROR = 'Неожиданное принятое значение, отсутствует статус: {status}'
 TOKEN_ERROR = 'Нет обязательной переменной окружения: {name}'
 TOKENS_ERROR = 'Ошибка токенов'
 SERVER_ERROR = ('Отказ обслуживания сети: "{field}: {error}" '
                 'Параметры запроса: {url}, {headers}, {params}')
 VERDICT = 'Изменился статус проверки работы "{name}". {verdict}'
 MAIN_ERROR = 'Сбой в работе программы: {error}'
+ERROR_DIGEST = ('Повторных сбоев за последние {minutes} мин.: {count}. '
+                'Последний: {error}')
 EMPTY_RESPONSE = 'Список ДЗ пустой.'
+CYCLE_STATS = ('Опросов: {polls}, без изменений: {unchanged}, '
+               'не изменено (304): {not_modified}, '
+               'предохранитель: {breaker}')
+CIRCUIT_OPEN = ('Запрос к API отклонён: предохранитель разомкнут после '
+                '{failures} сбоев подряд')
+SUBSCRIPTIONS_LOADED = 'Загружено подписок: {count}'
+STATE_RESTORED = 'Восстановлено состояние подписок: {count}'
+NO_SUBSCRIPTIONS = 'Нет ни одной подписки для опроса'
+STATUS_REPLY = ('Последнее изменение: {message}\n'
+                'Работ на проверке: {reviewing}. '
+                'Данные обновлены {age} c назад.')
+STATUS_EMPTY = 'Изменений статуса пока не было.'
+STATUS_REFRESHING = ('Данные устарели, запрошено обновление: новый статус '
+                     'придёт отдельным сообщением.')
+STATUS_NOT_SUBSCRIBED = 'Этот чат не подписан на уведомления о проверке.'
+RELOADED = ('Настройки перечитаны, изменены: {settings}; подписок '
+            '{count}, новых {added}')
+RELOAD_ERROR = 'Не удалось перечитать настройки: {error}'
+SHUTDOWN = 'Остановка: опрос завершён, очередь и состояние сохраняются'
+SHARD_ASSIGNED = ('Доля {shard} из {live}: подписок {count}, '
+                  'новых после перебалансировки {moved}')
+BACKFILL_DONE = 'История чата {chat_id} загружена до {until}'
+BACKFILL_ERROR = 'Сбой догрузки истории чата {chat_id} с {from_date}: {error}'
+UNKNOWN_SINK = ('Неизвестный приёмник уведомлений: {name}. '
+                'Доступны: {available}')
+TEMPLATE_FIELDS = {
+    'SEND_MESSAGE': ('message',),
+    'ERROR_SEND': ('error', 'message'),
+    'CONNECTION_ERROR': ('error', 'url', 'headers', 'params'),
+    'API_RESPONSE_ERROR': ('status_code', 'url', 'headers', 'params'),
+    'RESPONSE_ERROR': ('type_response',),
+    'HOMEWORKS_ERROR': ('type_homeworks',),
+    'API_TIMEOUT_ERROR': ('timeout', 'url', 'params'),
+    'DEADLINE_EXCEEDED': ('url', 'params'),
+    'CYCLE_OVERRUN': ('budget', 'elapsed', 'deferred'),
+    'KEYS_ERROR': (),
+    'VERDICT_ERROR': ('status',),
+    'TOKEN_ERROR': ('name',),
+    'TOKENS_ERROR': (),
+    'SERVER_ERROR': ('field', 'error', 'url', 'headers', 'params'),
+    'EMPTY_RESPONSE': (),
+    'CYCLE_STATS': ('polls', 'unchanged', 'not_modified', 'breaker'),
+    'CIRCUIT_OPEN': ('failures',),
+    'SUBSCRIPTIONS_LOADED': ('count',),
+    'STATE_RESTORED': ('count',),
+    'NO_SUBSCRIPTIONS': (),
+    'SHARD_ASSIGNED': ('shard', 'live', 'count', 'moved'),
+    'RELOADED': ('settings', 'count', 'added'),
+    'RELOAD_ERROR': ('error',),
+    'SHUTDOWN': (),
+    'BACKFILL_DONE': ('chat_id', 'until'),
+    'BACKFILL_ERROR': ('chat_id', 'from_date', 'error'),
+    'UNKNOWN_SINK': ('name', 'available'),
+}
+USER_TEMPLATE_FIELDS = {
+    'VERDICT': ('name', 'verdict'),
+    'MAIN_ERROR': ('error',),
+    'ERROR_DIGEST': ('minutes', 'count', 'error'),
+    'STATUS_REPLY': ('message', 'reviewing', 'age'),
+    'STATUS_EMPTY': (),
+    'STATUS_REFRESHING': (),
+    'STATUS_NOT_SUBSCRIBED': (),
+}
+LOCALES = {
+    'ru': (
+        {
+            'VERDICT': VERDICT,
+            'MAIN_ERROR': MAIN_ERROR,
+            'ERROR_DIGEST': ERROR_DIGEST,
+            'STATUS_REPLY': STATUS_REPLY,
+            'STATUS_EMPTY': STATUS_EMPTY,
+            'STATUS_REFRESHING': STATUS_REFRESHING,
+            'STATUS_NOT_SUBSCRIBED': STATUS_NOT_SUBSCRIBED,
+        },
+        VERDICTS,
+    ),
+    'en': (
+        {
+            'VERDICT': 'Review status of "{name}" has changed. {verdict}',
+            'MAIN_ERROR': 'The bot has failed: {error}',
+            'ERROR_DIGEST': ('Repeated failures in the last {minutes} '
+                             'min: {count}. Latest: {error}'),
+            'STATUS_REPLY': ('Last change: {message}\n'
+                             'Homeworks under review: {reviewing}. '
+                             'Updated {age} s ago.'),
+            'STATUS_EMPTY': 'No status changes yet.',
+            'STATUS_REFRESHING': ('The data is stale, a refresh is '
+                                  'requested: the new status will arrive '
+                                  'as a separate message.'),
+            'STATUS_NOT_SUBSCRIBED': ('This chat is not subscribed to '
+                                      'review notifications.'),
+        },
+        {
+            'approved': 'The reviewer liked everything. Hooray!',
+            'reviewing': 'The reviewer has started the review.',
+            'rejected': 'The reviewer has left some remarks.',
+        },
+    ),
+}
+check_templates(globals(), TEMPLATE_FIELDS)
+CATALOGS = {
+    locale: MessageCatalog(
+        templates, USER_TEMPLATE_FIELDS, verdicts, STATUS_NAMES
+    )
+    for locale, (templates, verdicts) in LOCALES.items()
+}
+MESSAGES = select_catalog(CATALOGS, LOCALE)
+
+API_LATENCY = metrics.Histogram(
+    'homework_api_request_seconds', 'Длительность запроса к API Практикума'
+)
+CYCLE_LATENCY = metrics.Histogram(
+    'homework_cycle_seconds', 'Длительность цикла опроса'
+)
+SEND_LATENCY = metrics.Histogram(
+    'homework_send_message_seconds', 'Длительность отправки в Telegram'
+)
+POLL_ERRORS = metrics.Counter(
+    'homework_poll_errors_total', 'Ошибки опроса по типу исключения',
+    labels=('type',)
+)
+NOTIFICATIONS = metrics.Counter(
+    'homework_notifications_total',
+    'Уведомления: поставленные в очередь и отброшенные как повтор',
+    labels=('kind', 'result')
+)
 
 
 def send_message(bot, message):
     """Отправка сообщения в telegramm."""
+    send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot, chat_id, message):
+    """Отправка сообщения в заданный чат telegramm."""
+    from telegram.error import TelegramError
+
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logger.info(SEND_MESSAGE.format(message=message))
+        deliver_message(bot, chat_id, message)
     except TelegramError as error:
         raise MessageError(ERROR_SEND.format(error=error, message=message))
 
 
+def deliver_message(bot, chat_id, message):
+    """Отправка сообщения с исходными ошибками Telegram для очереди."""
+    start = time.perf_counter()
+    try:
+        bot.send_message(chat_id=chat_id, text=message, timeout=SEND_TIMEOUT)
+    finally:
+        SEND_LATENCY.observe(time.perf_counter() - start)
+    logger.info(SEND_MESSAGE.format(message=message),
+                extra={'chat_id': chat_id})
+
+
+def log_send_error(chat_id, message, error):
+    """Журналирование сообщения, которое не удалось доставить."""
+    logger.error(ERROR_SEND.format(error=error, message=message),
+                 extra={'chat_id': chat_id})
+
+
+def create_outbox(bot, **kwargs):
+    """Запущенная очередь исходящих сообщений бота."""
+    return start_outbox(partial(deliver_message, bot), **kwargs)
+
+
+def start_outbox(send, **kwargs):
+    """Запущенная очередь сообщений с функцией отправки send."""
+    settings = dict(
+        workers=OUTBOX_WORKERS,
+        rate=TELEGRAM_RATE,
+        chat_interval=TELEGRAM_CHAT_INTERVAL,
+        retries=SEND_RETRIES,
+        backoff=SEND_BACKOFF,
+        limit=MESSAGE_LIMIT,
+        separator=MESSAGE_SEPARATOR,
+        on_error=log_send_error,
+        close_timeout=SHUTDOWN_TIMEOUT,
+    )
+    settings.update(kwargs)
+    return Outbox(send, **settings).start()
+
+
+def create_sink(name, bot, shares=1):
+    """Функция отправки приёмника и настройки его очереди.
+
+    Лимиты Telegram и вебхука общие для всех процессов с тем же ботом и
+    адресом, поэтому каждый из shares процессов получает свою долю.
+    """
+    if name == 'telegram':
+        return partial(deliver_message, bot), dict(
+            rate=TELEGRAM_RATE / shares
+        )
+    if name == 'webhook':
+        if NOTIFY_WEBHOOK_URL is None:
+            raise ValueError(TOKEN_ERROR.format(name='NOTIFY_WEBHOOK_URL'))
+        sink = WebhookSink(NOTIFY_WEBHOOK_URL, timeout=SEND_TIMEOUT)
+        return sink.send, dict(
+            rate=NOTIFY_WEBHOOK_RATE / shares,
+            chat_interval=NOTIFY_WEBHOOK_INTERVAL
+        )
+    if name == 'file':
+        return FileSink(NOTIFY_FILE).send, dict(
+            workers=1, rate=1000, chat_interval=NOTIFY_FILE_INTERVAL
+        )
+    raise ValueError(UNKNOWN_SINK.format(
+        name=name, available='telegram, webhook, file'
+    ))
+
+
+def start_sinks(bot, sinks=None, shares=1):
+    """Запущенные очереди приёмников: имя приёмника -> очередь.
+
+    Окно склейки у каждого приёмника своё (chat_interval): сообщения
+    чата, накопившиеся за это время после отправки, уходят одним.
+    """
+    outboxes = {}
+    for name in NOTIFY_SINKS if sinks is None else sinks:
+        send, settings = create_sink(name.strip(), bot, shares)
+        outboxes[name.strip()] = start_outbox(send, **settings)
+    return outboxes
+
+
+def combine_outboxes(outboxes):
+    """Одна очередь как есть, несколько - с рассылкой по всем."""
+    if len(outboxes) == 1:
+        return next(iter(outboxes.values()))
+    return Fanout(outboxes)
+
+
 def get_api_answer(current_timestamp):
     """Запрос к API Яндекс практикума."""
+    return request_api_answer(current_timestamp, HEADERS, API_TIMEOUT)
+
+
+def create_session(pool_size=POOL_SIZE, retries=API_RETRIES,
+                   backoff=API_BACKOFF):
+    """Сессия с пулом keep-alive соединений и повторами запросов."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def create_api_session(concurrency=POLL_CONCURRENCY, record_file=None):
+    """Сессия запросов к API; с record_file ответы пишутся в запись."""
+    session = create_session(pool_size=max(POOL_SIZE, concurrency))
+    if record_file is None:
+        return session
+    return RecordingSession(session, record_file)
+
+
+def request_api_answer(current_timestamp, headers, timeout=None,
+                       session=None):
+    """Запрос к API Яндекс практикума с заголовками подписки."""
+    homework_statuses = fetch_api_answer(
+        current_timestamp, headers, timeout, session
+    )
+    return decode_api_answer(homework_statuses, current_timestamp, headers)
+
+
+def fetch_api_answer(current_timestamp, headers, timeout=None,
+                     session=None):
+    """Запрос к API без разбора тела ответа."""
+    import requests
+
     params = {'from_date': current_timestamp}
-    PARAMETERS_REQUESTS = dict(url=ENDPOINT, headers=HEADERS, params=params)
+    PARAMETERS_REQUESTS = dict(url=ENDPOINT, headers=headers, params=params)
+    http = requests if session is None else session
     try:
-        homework_statuses = requests.get(**PARAMETERS_REQUESTS)
+        homework_statuses = http.get(**PARAMETERS_REQUESTS, timeout=timeout)
     except requests.RequestException as error:
         raise ConnectionError(
             CONNECTION_ERROR.format(
@@ -72,13 +461,22 @@ def get_api_answer(current_timestamp):
                 **PARAMETERS_REQUESTS
             )
         )
-    if homework_statuses.status_code != 200:
-        raise ServerError(
+    if homework_statuses.status_code not in ANSWER_STATUSES:
+        error = (
+            ClientError if homework_statuses.status_code in CLIENT_STATUSES
+            else ServerError
+        )
+        raise error(
             API_RESPONSE_ERROR.format(
                 status_code=homework_statuses.status_code,
                 **PARAMETERS_REQUESTS
             )
         )
+    return homework_statuses
+
+
+def decode_api_answer(homework_statuses, current_timestamp, headers):
+    """Разбор JSON-ответа API и проверка полей ошибок."""
     response = homework_statuses.json()
     for field in ['error', 'code']:
         if field in response:
@@ -86,12 +484,63 @@ def get_api_answer(current_timestamp):
                 SERVER_ERROR.format(
                     field=field,
                     error=response[field],
-                    **PARAMETERS_REQUESTS
+                    url=ENDPOINT,
+                    headers=headers,
+                    params={'from_date': current_timestamp}
                 )
             )
     return response
 
 
+def body_digest(content):
+    """Хэш тела ответа без поля current_date и значение этого поля."""
+    match = None
+    for match in CURRENT_DATE_PATTERN.finditer(content):
+        pass
+    if match is None:
+        return hashlib.blake2b(content, digest_size=16).digest(), None
+    stripped = content[:match.start()] + content[match.end():]
+    return (hashlib.blake2b(stripped, digest_size=16).digest(),
+            int(match.group(1)))
+
+
+async def get_api_answer_async(current_timestamp, headers, semaphore,
+                               executor=None, timeout=API_TIMEOUT,
+                               session=None, request=request_api_answer,
+                               deadline=None):
+    """Асинхронный запрос к API с ограничением числа одновременных.
+
+    С deadline (по time.monotonic) таймаут запроса не выходит за срок
+    цикла; если срок прошёл до запроса или запрос не уложился в него,
+    поднимается DeadlineExceeded, а не ошибка API.
+    """
+    loop = asyncio.get_running_loop()
+    params = {'from_date': current_timestamp}
+    async with semaphore:
+        limit = timeout
+        if deadline is not None:
+            limit = min(timeout, deadline - time.monotonic())
+            if limit <= 0:
+                raise DeadlineExceeded(
+                    DEADLINE_EXCEEDED.format(url=ENDPOINT, params=params)
+                )
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(
+                executor,
+                partial(request, current_timestamp, headers, limit, session)
+            ), limit)
+        except (asyncio.TimeoutError, ConnectionError) as error:
+            if limit < timeout and time.monotonic() >= deadline:
+                raise DeadlineExceeded(
+                    DEADLINE_EXCEEDED.format(url=ENDPOINT, params=params)
+                )
+            if isinstance(error, ConnectionError):
+                raise
+            raise ConnectionError(API_TIMEOUT_ERROR.format(
+                timeout=timeout, url=ENDPOINT, params=params
+            ))
+
+
 def check_response(response):
     """Проверка ответа API на корректность."""
     if not isinstance(response, dict):
@@ -109,69 +558,1098 @@ def check_response(response):
     return homeworks
 
 
+def iter_homeworks(content, current_timestamp, headers, cursor=None):
+    """Потоковый разбор ответа API: работы по одной, от новых к старым.
+
+    Форма ответа проверяется так же, как в check_response, а поля error
+    и code - как в decode_api_answer, но без построения всего списка.
+    Разбор прекращается на первой работе, обновлённой раньше cursor;
+    остаток тела после неё не читается.
+    """
+    reader = JsonReader(content.decode('utf-8'))
+    if reader.peek() != '{':
+        raise TypeError(
+            RESPONSE_ERROR.format(type_response=type(reader.value()))
+        )
+    found = False
+    for key in reader.members():
+        if key in ('error', 'code'):
+            raise RuntimeError(
+                SERVER_ERROR.format(
+                    field=key,
+                    error=reader.value(),
+                    url=ENDPOINT,
+                    headers=headers,
+                    params={'from_date': current_timestamp}
+                )
+            )
+        if key != 'homeworks':
+            reader.value()
+            continue
+        if reader.peek() != '[':
+            raise TypeError(
+                HOMEWORKS_ERROR.format(type_homeworks=type(reader.value()))
+            )
+        found = True
+        for homework in reader.items():
+            updated = homework_timestamp(homework)
+            if cursor is not None and updated is not None and (
+                updated < cursor
+            ):
+                return
+            yield homework
+    if not found:
+        raise KeyError(KEYS_ERROR)
+
+
+def in_window(homework, end, until):
+    """Относится ли работа к окну истории, заканчивающемуся в end.
+
+    Работы без времени обновления относятся к последнему окну.
+    """
+    updated = homework_timestamp(homework)
+    if updated is None:
+        return end >= until
+    return updated < end
+
+
+def homework_timestamp(homework):
+    """Время последнего обновления работы в секундах или None."""
+    try:
+        return datetime.strptime(
+            homework['date_updated'], DATE_FORMAT
+        ).replace(tzinfo=timezone.utc).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
 def parse_status(homework):
     """Определение статуса ревью."""
     name = homework['homework_name']
-    status = homework['status']
-    verdict = VERDICTS.get(status)
-    if not verdict:
+    return format_verdict(name, status_code(homework['status']))
+
+
+def status_code(status):
+    """Код статуса работы для компактного хранения."""
+    code = STATUS_CODES.get(status)
+    if code is None:
         raise ValueError(VERDICT_ERROR.format(status=status))
-    return VERDICT.format(name=name, verdict=verdict)
+    return code
+
+
+def format_verdict(name, code):
+    """Текст уведомления по названию работы и коду статуса."""
+    return MESSAGES.verdict(code, name)
+
+
+def homework_key(homework):
+    """Ключ работы для отслеживания её статуса."""
+    return str(homework.get('id', homework['homework_name']))
+
+
+def diff_statuses(statuses, homeworks):
+    """Изменившиеся работы ответа: (ключ, код, название), от старых.
+
+    Работы принимаются в порядке ответа API, от новых к старым, любым
+    итерируемым объектом, в том числе потоком из iter_homeworks.
+    Названия работ интернируются: у тысяч студентов они одинаковые.
+    Строковые статусы, сохранённые прежними версиями, сравниваются по
+    их кодам.
+    """
+    changes = []
+    for homework in homeworks:
+        key = homework_key(homework)
+        name = sys.intern(homework['homework_name'])
+        code = status_code(homework['status'])
+        previous = statuses.get(key)
+        if isinstance(previous, str):
+            previous = STATUS_CODES.get(previous)
+        if previous != code:
+            changes.append((key, code, name))
+    changes.reverse()
+    return changes
+
+
+def create_limiter(rate=API_RATE, burst=API_BURST, shares=1):
+    """Общий лимитер запросов к API, при нулевой скорости не нужен.
+
+    Лимит rate делится между shares процессами, опрашивающими API
+    независимо: каждый получает свою долю скорости и запаса.
+    """
+    if not rate:
+        return None
+    return TokenBucket(rate / shares, max(1, burst // shares))
+
+
+def create_response_cache(ttl=RESPONSE_CACHE_TTL, size=RESPONSE_CACHE_SIZE,
+                          path=RESPONSE_CACHE_DB):
+    """Кэш ответов API, с path - с общим уровнем в SQLite."""
+    if not ttl:
+        return None
+    return ResponseCache(
+        ttl, size, None if path is None else SQLiteResponseCache(path)
+    )
+
+
+def create_scheduler(**kwargs):
+    """Планировщик опросов с настройками из окружения."""
+    settings = dict(
+        idle_interval=RETRY_TIME,
+        min_interval=POLL_MIN_INTERVAL,
+        reviewing_interval=POLL_REVIEWING_INTERVAL,
+        max_interval=POLL_MAX_INTERVAL,
+        jitter=POLL_JITTER,
+        budget=POLL_BUDGET,
+    )
+    settings.update(kwargs)
+    return AdaptiveScheduler(**settings)
 
 
 def check_tokens():
     """Проверка наличия необходимых токенов."""
-    empty_tokens = [name for name in TOKENS if globals()[name] is None]
+    names = TOKENS if SUBSCRIPTIONS_FILE is None else REGISTRY_TOKENS
+    empty_tokens = [name for name in names if globals()[name] is None]
     if empty_tokens:
         logger.critical(TOKEN_ERROR.format(name=empty_tokens))
     return not empty_tokens
 
 
+def load_registry(current_timestamp):
+    """Сбор подписок из переменных окружения и файла подписок."""
+    registry = SubscriptionRegistry()
+    if PRACTICUM_TOKEN is not None and TELEGRAM_CHAT_ID is not None:
+        registry.add(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID, current_timestamp)
+    if SUBSCRIPTIONS_FILE is not None:
+        registry.load(SUBSCRIPTIONS_FILE, current_timestamp)
+    logger.info(SUBSCRIPTIONS_LOADED.format(count=len(registry)))
+    return registry
+
+
+def shard_key(subscription):
+    """Ключ подписки для распределения по долям."""
+    return f'{subscription.token}:{subscription.chat_id}'
+
+
+def shard_registry(registry, live_shards, shard, dyno_count=None,
+                   dyno_index=None):
+    """Подписки, которые обслуживает доля shard этого дино.
+
+    Подписки сначала делятся между дино, затем между живыми долями
+    дино, оба раза согласованным хэшированием: при изменении числа долей
+    переезжают только подписки исчезнувшей или добавленной доли.
+    """
+    dynos = HashRing(range(dyno_count or DYNO_COUNT))
+    dyno_index = DYNO_INDEX if dyno_index is None else dyno_index
+    shards = HashRing(live_shards)
+    return registry.select(
+        lambda subscription: (
+            dynos.node_for(shard_key(subscription)) == dyno_index
+            and shards.node_for(shard_key(subscription)) == shard
+        )
+    )
+
+
+class PollingEngine:
+    """Опрос API Практикума по всем подпискам реестра.
+
+    Лимитер и предохранитель у каждого процесса свои. Из общих лимитов
+    API_RATE, TELEGRAM_RATE и NOTIFY_WEBHOOK_RATE движок берёт долю
+    1/shares. Предохранитель считает только сбои своего процесса и
+    размыкается по своей серии сбоев подряд.
+    """
+
+    def __init__(self, bot, registry, concurrency=POLL_CONCURRENCY,
+                 timeout=API_TIMEOUT, session=None, state_store=None,
+                 scheduler=None, outbox=None, limiter=None, breaker=None,
+                 stream_parsing=STREAM_PARSING, suppressor=None,
+                 clock=time.time, cache=CACHE_FROM_ENV,
+                 cycle_budget=CYCLE_BUDGET,
+                 shares=1, replies=None):
+        """Движок с ботом, реестром подписок и лимитом параллельности.
+
+        replies - очередь ответов на команды бота в Telegram. По умолчанию
+        это очередь приёмника telegram, если он есть среди NOTIFY_SINKS.
+        Кэш ответов по умолчанию настраивается из окружения, cache=None
+        отключает его.
+        """
+        self.shares = shares
+        self.clock = clock
+        self.cache = (
+            create_response_cache(
+                RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_DB
+            ) if cache is CACHE_FROM_ENV else cache
+        )
+        self.flights = SingleFlight()
+        self.stream_parsing = stream_parsing
+        self.suppressor = (
+            ErrorSuppressor(ERROR_WINDOW, ERROR_TRACKED_LIMIT)
+            if suppressor is None else suppressor
+        )
+        self.bot = bot
+        self.limiter = limiter or create_limiter(API_RATE, API_BURST, shares)
+        self.breaker = breaker or CircuitBreaker(
+            BREAKER_THRESHOLD, BREAKER_RESET, BREAKER_PROBES
+        )
+        if outbox is None:
+            outboxes = start_sinks(bot, shares=shares)
+            outbox = combine_outboxes(outboxes)
+            if replies is None:
+                replies = outboxes.get('telegram')
+        self.outbox = outbox
+        self.replies = replies
+        self.own_replies = False
+        self.registry = registry
+        self.state_store = state_store or MemoryStateStore()
+        self.scheduler = (
+            create_scheduler() if scheduler is None else scheduler
+        )
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cycle_budget = cycle_budget
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.session = session or create_api_session(
+            concurrency, RECORD_FILE
+        )
+        self.stats = Counter()
+        self.wakeups = queue.SimpleQueue()
+        self.stopping = threading.Event()
+        self.reload_requested = False
+        self.backfills = {}
+        self.loop = None
+        self.tasks = []
+
+    async def poll(self, subscription, semaphore, deadline=None):
+        """Один опрос API и уведомление для подписки.
+
+        Возвращает None, если опрос не уложился в срок цикла и отложен.
+        """
+        self.stats['polls'] += 1
+        changed = False
+        try:
+            homework_statuses = await self.request(
+                subscription, semaphore, deadline=deadline
+            )
+            changed = self.handle_api_answer(subscription, homework_statuses)
+        except (DeadlineExceeded, asyncio.CancelledError):
+            self.stats['deferred'] += 1
+            return None
+        except CircuitOpenError as error:
+            POLL_ERRORS.inc(type=type(error).__name__)
+            logger.warning(error, extra={'chat_id': subscription.chat_id})
+        except Exception as error:
+            POLL_ERRORS.inc(type=type(error).__name__)
+            self.notify_error(subscription, error)
+        self.state_store.save(subscription)
+        return changed
+
+    async def request(self, subscription, semaphore, from_date=None,
+                      deadline=None):
+        """Запрос к API через общий лимитер запросов.
+
+        С from_date запрашивается история: без валидаторов прошлого ответа.
+        Маркер лимитера, которого не дождаться до deadline, не берётся:
+        опрос сразу откладывается и не занимает долю следующего цикла.
+        """
+        if from_date is None:
+            from_date = subscription.current_timestamp
+            headers = subscription.conditional_headers
+        else:
+            headers = subscription.headers
+        if self.cache is not None:
+            cached = self.cache.get(cache_key(subscription.token, from_date))
+            if cached is not None:
+                return cached.for_request(headers)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        delay = 0
+        if self.limiter is not None:
+            delay = self.limiter.reserve(max_delay=remaining)
+        if delay is None or (remaining is not None and remaining <= 0):
+            raise DeadlineExceeded(DEADLINE_EXCEEDED.format(
+                url=ENDPOINT, params={'from_date': from_date}
+            ))
+        if self.limiter is not None:
+            await asyncio.sleep(delay)
+        return await get_api_answer_async(
+            from_date, headers, semaphore, self.executor, self.timeout,
+            self.session, request=self.cached_fetch, deadline=deadline
+        )
+
+    def cached_fetch(self, current_timestamp, headers, timeout=None,
+                     session=None):
+        """Запрос к API через кэш ответов и объединение одинаковых.
+
+        Одновременные запросы с тем же токеном и from_date ждут один
+        запрос к API. Он делается без валидаторов, чтобы ответ подошёл
+        всем ждущим; 304 каждому строится из кэша по его ETag. В кэш
+        попадают только ответы 200. Промах уже учтён в request, здесь
+        кэш только просматривается: ответ мог появиться, пока запрос ждал
+        очереди.
+        """
+        if self.cache is None:
+            return self.guarded_fetch(
+                current_timestamp, headers, timeout, session
+            )
+        key = cache_key(
+            headers['Authorization'].split(' ', 1)[1], current_timestamp
+        )
+        response = self.cache.peek(key) or self.flights.do(key, partial(
+            self.fetch_to_cache, key, current_timestamp, headers, timeout,
+            session
+        ))
+        return response.for_request(headers)
+
+    def fetch_to_cache(self, key, current_timestamp, headers, timeout,
+                       session):
+        """Безусловный запрос к API с записью ответа 200 в кэш."""
+        response = CachedResponse.from_response(self.guarded_fetch(
+            current_timestamp,
+            {
+                name: value for name, value in headers.items()
+                if name not in CONDITIONAL_HEADERS
+            },
+            timeout, session
+        ))
+        if response.status_code == HTTPStatus.OK:
+            self.cache.put(key, response)
+        return response
+
+    def guarded_fetch(self, *args):
+        """Запрос к API через предохранитель.
+
+        Сбоями считаются ошибки соединения, 5xx и 429. Отказ 4xx касается
+        только одной подписки, например отозванного токена, и означает,
+        что API отвечает: на предохранитель он действует как успех.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                CIRCUIT_OPEN.format(failures=self.breaker.failures)
+            )
+        start = time.perf_counter()
+        try:
+            homework_statuses = fetch_api_answer(*args)
+        except ClientError:
+            self.breaker.record_success()
+            raise
+        except (ConnectionError, ServerError):
+            self.breaker.record_failure()
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - start)
+        self.breaker.record_success()
+        return homework_statuses
+
+    def handle_api_answer(self, subscription, homework_statuses):
+        """Обработка ответа API, если тело изменилось с прошлого опроса."""
+        subscription.checked_at = self.clock()
+        if homework_statuses.status_code == HTTPStatus.NOT_MODIFIED:
+            self.stats['not_modified'] += 1
+            subscription.last_error = None
+            return False
+        digest, current_date = body_digest(homework_statuses.content)
+        if digest == subscription.digest:
+            self.stats['unchanged'] += 1
+            if current_date is not None:
+                subscription.current_timestamp = current_date
+            subscription.last_error = None
+            return False
+        if self.stream_parsing:
+            changed = self.handle_homeworks(
+                subscription,
+                iter_homeworks(
+                    homework_statuses.content,
+                    subscription.current_timestamp, subscription.headers,
+                    cursor=subscription.current_timestamp
+                ),
+                current_date
+            )
+        else:
+            response = decode_api_answer(
+                homework_statuses, subscription.current_timestamp,
+                subscription.headers
+            )
+            changed = self.handle_response(subscription, response)
+        subscription.digest = digest
+        subscription.etag = homework_statuses.headers.get('ETag')
+        subscription.last_modified = homework_statuses.headers.get(
+            'Last-Modified'
+        )
+        return changed
+
+    def handle_response(self, subscription, response):
+        """Разбор ответа API и отправка нового статуса подписке."""
+        return self.handle_homeworks(
+            subscription, check_response(response),
+            response.get('current_date')
+        )
+
+    def handle_homeworks(self, subscription, homeworks, current_date):
+        """Отправка изменившихся статусов работ и сдвиг курсора."""
+        seen = Counter()
+
+        def counted():
+            for homework in homeworks:
+                seen['homeworks'] += 1
+                yield homework
+
+        changes = diff_statuses(subscription.statuses, counted())
+        if not seen['homeworks']:
+            logger.debug(EMPTY_RESPONSE)
+        NOTIFICATIONS.inc(len(changes), kind='status', result='queued')
+        NOTIFICATIONS.inc(
+            seen['homeworks'] - len(changes), kind='status',
+            result='deduplicated'
+        )
+        for key, code, name in changes:
+            self.outbox.put(subscription.chat_id, format_verdict(name, code))
+            subscription.statuses[key] = code
+            subscription.last_name = name
+            subscription.last_status = code
+        if current_date is not None:
+            subscription.current_timestamp = current_date
+        subscription.last_error = None
+        return bool(changes)
+
+    def notify_error(self, subscription, error):
+        """Уведомление подписки об ошибке без повторов.
+
+        Ошибки сравниваются по отпечатку: классу и тексту без чисел.
+        Повторы в окне ERROR_WINDOW не отправляются, а попадают в сводку.
+        """
+        message = MESSAGES.render('MAIN_ERROR', error=error)
+        logger.error(message, extra={
+            'chat_id': subscription.chat_id,
+            'error_type': type(error).__name__,
+        })
+        subscription.last_error = fingerprint(error)
+        if not self.suppressor.should_send(
+            subscription.chat_id, subscription.last_error, str(error)
+        ):
+            NOTIFICATIONS.inc(kind='error', result='deduplicated')
+            return
+        NOTIFICATIONS.inc(kind='error', result='queued')
+        self.outbox.put(subscription.chat_id, message)
+
+    def send_error_digests(self):
+        """Сводки о подавленных повторах ошибок за истёкшие окна."""
+        minutes = round(self.suppressor.window / 60)
+        for chat_id, count, error in self.suppressor.digests():
+            NOTIFICATIONS.inc(kind='error', result='digest')
+            self.outbox.put(chat_id, MESSAGES.render(
+                'ERROR_DIGEST', minutes=minutes, count=count, error=error
+            ))
+
+    async def run_cycle_async(self, subscriptions, deadline=None):
+        """Параллельный опрос подписок."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await self.gather(
+            self.poll(subscription, semaphore, deadline)
+            for subscription in subscriptions
+        )
+
+    async def gather(self, coroutines):
+        """Запуск задач цикла, которые stop может прервать."""
+        self.loop = asyncio.get_running_loop()
+        self.tasks = [asyncio.ensure_future(coroutine)
+                      for coroutine in coroutines]
+        try:
+            if self.stopping.is_set():
+                self.interrupt()
+            return await asyncio.gather(*self.tasks)
+        finally:
+            self.loop = None
+            self.tasks = []
+
+    def interrupt(self):
+        """Отмена ожидающих запросов цикла: опросы откладываются."""
+        for task in self.tasks:
+            task.cancel()
+
+    def run_cycle(self, subscriptions=None):
+        """Опрос подписок, по умолчанию всех, и планирование следующего.
+
+        С бюджетом cycle_budget каждый опрос получает таймаут не дольше
+        остатка цикла; опросы, не уложившиеся в него, откладываются на
+        следующий цикл, а не задерживают этот.
+        """
+        if subscriptions is None:
+            subscriptions = list(self.registry)
+        start = time.monotonic()
+        deadline = start + self.cycle_budget if self.cycle_budget else None
+        results = asyncio.run(self.run_cycle_async(subscriptions, deadline))
+        for subscription, changed in zip(subscriptions, results):
+            if changed is None:
+                self.scheduler.prioritize(subscription.key)
+                continue
+            self.scheduler.reschedule(
+                subscription.key, changed,
+                REVIEWING_CODE in subscription.statuses.values()
+            )
+        elapsed = time.monotonic() - start
+        CYCLE_LATENCY.observe(elapsed)
+        deferred = results.count(None)
+        if deferred or (self.cycle_budget and elapsed > self.cycle_budget):
+            self.stats['overruns'] += 1
+            logger.warning(CYCLE_OVERRUN.format(
+                budget=self.cycle_budget, elapsed=round(elapsed, 2),
+                deferred=deferred
+            ))
+        self.state_store.flush()
+        self.send_error_digests()
+        logger.debug(CYCLE_STATS.format(
+            polls=self.stats['polls'],
+            unchanged=self.stats['unchanged'],
+            not_modified=self.stats['not_modified'],
+            breaker=self.breaker.metrics(),
+        ))
+
+    def assign(self, registry):
+        """Смена обслуживаемых подписок после перебалансировки долей.
+
+        Перед сменой накопленное состояние записывается в хранилище, а
+        у доставшихся подписок восстанавливается из него.
+        """
+        self.state_store.flush()
+        added = [
+            subscription for subscription in registry
+            if subscription.key not in self.registry
+        ]
+        self.registry = registry
+        self.state_store.restore(added)
+        self.scheduler.sync(
+            subscription.key for subscription in self.registry
+        )
+        self.queue_backfill(added)
+        return len(added)
+
+    def queue_backfill(self, subscriptions):
+        """Постановка подписок в очередь догрузки истории.
+
+        Новая, ещё ни разу не опрошенная подписка получает контрольную
+        точку на BACKFILL_PERIOD секунд назад от своего курсора; подписка
+        с сохранённой точкой продолжает с неё после перезапуска.
+        """
+        for subscription in subscriptions:
+            until = subscription.current_timestamp
+            if (BACKFILL_PERIOD and until and subscription.backfill is None
+                    and subscription.checked_at is None
+                    and not subscription.statuses):
+                subscription.backfill = [
+                    max(0, until - BACKFILL_PERIOD), until
+                ]
+            if subscription.backfill is not None:
+                self.backfills[subscription.key] = None
+        return len(self.backfills)
+
+    def run_backfill(self, limit=BACKFILL_BATCH):
+        """Одно окно истории для первых limit подписок очереди догрузки."""
+        subscriptions = []
+        for key in list(itertools.islice(self.backfills, limit)):
+            del self.backfills[key]
+            subscription = self.registry.get(*key)
+            if subscription is not None and (
+                subscription.backfill is not None
+            ):
+                subscriptions.append(subscription)
+        asyncio.run(self.run_backfill_async(subscriptions))
+        self.state_store.flush()
+        return len(subscriptions)
+
+    async def run_backfill_async(self, subscriptions):
+        """Параллельная загрузка окон истории."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await self.gather(
+            self.backfill_window(subscription, semaphore)
+            for subscription in subscriptions
+        )
+
+    async def backfill_window(self, subscription, semaphore):
+        """Загрузка одного окна истории подписки без уведомлений.
+
+        API отдаёт работы, обновлённые после from_date, от новых к старым:
+        работы новее конца окна пропускаются потоковым разбором, а разбор
+        прекращается на первой работе старше начала окна. Статусы истории
+        записываются без отправки сообщений, контрольная точка сдвигается
+        только после успешного окна.
+
+        У API нет верхней границы выборки: запрос окна скачивает и
+        разбирает всё от его начала до сейчас. Поэтому по умолчанию
+        (BACKFILL_WINDOW=0) вся история берётся одним запросом, а окна
+        имеют смысл только для частых контрольных точек при очень
+        длинной истории ценой повторной загрузки.
+        """
+        start, until = subscription.backfill
+        end = min(start + BACKFILL_WINDOW, until) if BACKFILL_WINDOW else until
+        try:
+            homework_statuses = await self.request(
+                subscription, semaphore, from_date=start
+            )
+            changes = diff_statuses(subscription.statuses, (
+                homework for homework in iter_homeworks(
+                    homework_statuses.content, start, subscription.headers,
+                    cursor=start
+                )
+                if in_window(homework, end, until)
+            ))
+        except asyncio.CancelledError:
+            self.backfills[subscription.key] = None
+            return
+        except Exception as error:
+            POLL_ERRORS.inc(type=type(error).__name__)
+            logger.warning(
+                BACKFILL_ERROR.format(
+                    chat_id=subscription.chat_id, from_date=start,
+                    error=error
+                ),
+                extra={'chat_id': subscription.chat_id}
+            )
+            self.backfills[subscription.key] = None
+            return
+        self.stats['backfill_windows'] += 1
+        for key, code, name in changes:
+            subscription.statuses[key] = code
+        if end < until:
+            subscription.backfill = [end, until]
+            self.backfills[subscription.key] = None
+        else:
+            subscription.backfill = None
+            logger.info(BACKFILL_DONE.format(
+                chat_id=subscription.chat_id, until=until
+            ))
+        self.state_store.save(subscription)
+
+    def run(self, load=None):
+        """Цикл опроса до вызова stop.
+
+        По request_reload перед очередным опросом перечитываются
+        настройки и подписки: load() возвращает новый реестр.
+        """
+        self.scheduler.sync(
+            subscription.key for subscription in self.registry
+        )
+        self.queue_backfill(self.registry)
+        try:
+            while not self.stopping.is_set():
+                if self.reload_requested and load is not None:
+                    self.reload_requested = False
+                    self.reload(load)
+                self.step()
+                self.wait(self.wait_time())
+            logger.info(SHUTDOWN)
+        finally:
+            self.close()
+
+    def stop(self):
+        """Мягкая остановка цикла; безопасно из обработчика сигнала.
+
+        Идущий цикл не дожидается ответов API: ожидающие и начатые
+        запросы отменяются, их опросы откладываются, а состояние и
+        очередь сообщений сохраняются сразу.
+        """
+        self.stopping.set()
+        self.wakeups.put(None)
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.interrupt)
+            except RuntimeError:
+                pass
+
+    def request_reload(self):
+        """Перечитывание настроек перед следующим опросом."""
+        self.reload_requested = True
+        self.wakeups.put(None)
+
+    def reload(self, load):
+        """Применение новых настроек и подписок без перезапуска.
+
+        Подписки, оставшиеся в списке, сохраняют своё состояние, а
+        соединения и очередь сообщений продолжают работать. Состояние
+        исчезнувших из списка подписок удаляется из хранилища.
+        """
+        try:
+            changed = reload_settings()
+            registry = load().reuse(self.registry)
+        except Exception as error:
+            logger.error(RELOAD_ERROR.format(error=error))
+            return
+        self.configure()
+        removed = [
+            subscription for subscription in self.registry
+            if subscription.key not in registry
+        ]
+        added = self.assign(registry)
+        for subscription in removed:
+            self.state_store.forget(subscription)
+        logger.info(RELOADED.format(
+            settings=changed, count=len(self.registry), added=added
+        ))
+
+    def configure(self):
+        """Применение текущих настроек опроса к работающему движку."""
+        self.scheduler.configure(
+            min_interval=POLL_MIN_INTERVAL,
+            reviewing_interval=POLL_REVIEWING_INTERVAL,
+            max_interval=POLL_MAX_INTERVAL,
+            jitter=POLL_JITTER,
+            budget=POLL_BUDGET,
+        )
+        if self.concurrency != POLL_CONCURRENCY:
+            executor = self.executor
+            self.executor = ThreadPoolExecutor(max_workers=POLL_CONCURRENCY)
+            self.concurrency = POLL_CONCURRENCY
+            executor.shutdown(wait=False)
+        self.timeout = API_TIMEOUT
+        self.cycle_budget = CYCLE_BUDGET
+        self.limiter = create_limiter(API_RATE, API_BURST, self.shares)
+
+    def request_poll(self, key):
+        """Внеочередной опрос подписки; безопасно из других потоков."""
+        self.wakeups.put(key)
+
+    def wait(self, timeout):
+        """Ожидание очередного опроса или внеочередного запроса."""
+        try:
+            key = self.wakeups.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            if key in self.registry:
+                self.scheduler.prioritize(key)
+            try:
+                key = self.wakeups.get_nowait()
+            except queue.Empty:
+                return
+
+    def run_due(self, limit=None):
+        """Опрос подписок, которым подошло время, не больше limit за раз."""
+        subscriptions = [
+            subscription for subscription in (
+                self.registry.get(*key)
+                for key in self.scheduler.pop_due(limit=limit)
+            )
+            if subscription is not None
+        ]
+        if subscriptions:
+            self.run_cycle(subscriptions)
+        return len(subscriptions)
+
+    def step(self, limit=None):
+        """Опросы по расписанию, а в простое - окно догрузки истории."""
+        polled = self.run_due(limit)
+        if not polled and self.backfills:
+            self.run_backfill()
+        return polled
+
+    def wait_time(self):
+        """Сколько секунд ждать до следующего шага движка."""
+        wait = self.scheduler.wait_time()
+        if self.backfills:
+            return min(wait, BACKFILL_PAUSE)
+        return wait
+
+    def start_replies(self):
+        """Своя очередь ответов, если Telegram не среди приёмников."""
+        if self.replies is None:
+            self.replies = create_outbox(
+                self.bot, rate=TELEGRAM_RATE / self.shares
+            )
+            self.own_replies = True
+        return self.replies
+
+    def register_metrics(self, registry=metrics.REGISTRY):
+        """Экспорт счётчиков и очередей движка в метрики."""
+        for name, help, function, kind, label in (
+            ('homework_polls_total', 'Опросы: всего и без разбора ответа',
+             lambda: dict(self.stats), 'counter', 'result'),
+            ('homework_outbox_total', 'События очереди исходящих сообщений',
+             lambda: dict(self.outbox.stats), 'counter', 'event'),
+            ('homework_outbox_depth', 'Сообщения, ожидающие отправки',
+             lambda: self.outbox.depth, 'gauge', None),
+            ('homework_scheduled_subscriptions', 'Подписки в расписании',
+             lambda: len(self.scheduler), 'gauge', None),
+            ('homework_backfill_pending', 'Подписки с недогруженной историей',
+             lambda: len(self.backfills), 'gauge', None),
+            ('homework_breaker', 'Состояние предохранителя API',
+             self.breaker.metrics, 'gauge', 'field'),
+        ):
+            metrics.CallbackMetric(
+                name, help, function, kind, label, registry=registry
+            )
+        if self.cache is not None:
+            metrics.CallbackMetric(
+                'homework_response_cache_total', 'Обращения к кэшу ответов',
+                lambda: dict(self.cache.stats, **self.flights.stats),
+                'counter', 'result', registry=registry
+            )
+
+    def close(self):
+        """Закрытие пула соединений и потоков, запись состояния."""
+        self.outbox.close()
+        if self.own_replies:
+            self.replies.close()
+        if self.cache is not None:
+            self.cache.close()
+        self.executor.shutdown(wait=False)
+        self.session.close()
+        self.state_store.close()
+
+
+def create_replay_engine(records, clock, seed=0, **kwargs):
+    """Движок для прогона записанных ответов API на виртуальных часах.
+
+    Каждый обезличенный ключ записи становится подпиской со своим чатом,
+    уведомления собираются в ReplayOutbox, а планировщик, предохранитель
+    и подавление ошибок идут по часам clock. Лимитер запросов не нужен:
+    ответы не запрашиваются у API. Ответы отдаются без потоков, а разброс
+    опросов берётся из генератора с зерном seed, так что прогоны с одним
+    зерном совпадают. Кэш ответов с RESPONSE_CACHE_TTL живёт только в
+    памяти и тоже идёт по часам clock.
+    """
+    session = ReplaySession(records, clock)
+    registry = SubscriptionRegistry()
+    for chat_id, key in enumerate(session.keys):
+        registry.add(key, chat_id, 0)
+    settings = dict(
+        session=session,
+        outbox=ReplayOutbox(clock),
+        scheduler=create_scheduler(
+            clock=clock.monotonic, rand=random.Random(seed).random
+        ),
+        breaker=CircuitBreaker(
+            BREAKER_THRESHOLD, BREAKER_RESET, BREAKER_PROBES,
+            clock=clock.monotonic
+        ),
+        suppressor=ErrorSuppressor(
+            ERROR_WINDOW, ERROR_TRACKED_LIMIT, clock=clock.monotonic
+        ),
+        clock=clock.time,
+        cache=(
+            ResponseCache(
+                RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, clock=clock.time
+            )
+            if RESPONSE_CACHE_TTL else None
+        ),
+    )
+    settings.update(kwargs)
+    engine = PollingEngine(None, SubscriptionRegistry(), **settings)
+    engine.limiter = None
+    engine.executor.shutdown()
+    engine.executor = InlineExecutor()
+    engine.assign(registry)
+    return engine
+
+
+def reload_settings():
+    """Перечитывание .env и настроек опроса, меняемых на ходу."""
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    changed = {}
+    for name, cast in TUNABLES.items():
+        value = cast(os.getenv(name, globals()[name]))
+        if value != globals()[name]:
+            globals()[name] = value
+            changed[name] = value
+    return changed
+
+
+def install_signal_handlers(stop, reload):
+    """SIGTERM и SIGINT - мягкая остановка, SIGHUP - перечитывание."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop())
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload())
+
+
+def status_reply(engine, chat_id, now=None):
+    """Ответ на /status из последнего известного состояния подписок.
+
+    API Практикума не запрашивается; если данные старше STATUS_MAX_AGE,
+    подписка ставится на внеочередной опрос.
+    """
+    now = time.time() if now is None else now
+    subscriptions = engine.registry.for_chat(chat_id)
+    if not subscriptions:
+        return MESSAGES.render('STATUS_NOT_SUBSCRIBED')
+    replies = []
+    for subscription in subscriptions:
+        stale = (subscription.checked_at is None
+                 or now - subscription.checked_at > STATUS_MAX_AGE)
+        if stale:
+            engine.request_poll(subscription.key)
+        if subscription.checked_at is None:
+            replies.append(MESSAGES.render('STATUS_REFRESHING'))
+            continue
+        replies.append(MESSAGES.render(
+            'STATUS_REPLY',
+            message=(
+                MESSAGES.render('STATUS_EMPTY')
+                if subscription.last_name is None
+                else format_verdict(
+                    subscription.last_name, subscription.last_status
+                )
+            ),
+            reviewing=list(subscription.statuses.values()).count(
+                REVIEWING_CODE
+            ),
+            age=int(now - subscription.checked_at),
+        ))
+        if stale:
+            replies.append(MESSAGES.render('STATUS_REFRESHING'))
+    return MESSAGE_SEPARATOR.join(replies)
+
+
+def handle_status_command(engine, update, context):
+    """Обработчик команды /status: ответ только в Telegram."""
+    chat_id = update.effective_chat.id
+    engine.replies.put(chat_id, status_reply(engine, chat_id))
+
+
+def create_updater(engine, token=None):
+    """Приём входящих команд бота с обработчиком /status."""
+    from telegram.ext import CommandHandler, Updater
+
+    engine.start_replies()
+    updater = Updater(token=token or TELEGRAM_TOKEN, use_context=True)
+    updater.dispatcher.add_handler(
+        CommandHandler('status', partial(handle_status_command, engine))
+    )
+    return updater
+
+
+def start_updates(engine, mode=BOT_UPDATES):
+    """Запуск приёма команд: long polling или webhook, иначе None."""
+    if mode not in ('polling', 'webhook'):
+        return None
+    updater = create_updater(engine)
+    if mode == 'polling':
+        updater.start_polling()
+    else:
+        updater.start_webhook(
+            listen='0.0.0.0', port=WEBHOOK_PORT, url_path=TELEGRAM_TOKEN,
+            webhook_url=f'{WEBHOOK_URL}/{TELEGRAM_TOKEN}'
+        )
+    return updater
+
+
+def run_worker(shard, live_shards, control, health):
+    """Процесс-обработчик одной доли подписок под надзором Supervisor.
+
+    Сигналы обрабатывает надзиратель: остановка и перечитывание приходят
+    по очереди control. Шаг опрашивает не больше SHARD_BATCH подписок,
+    чтобы отчёт о здоровье уходил и при долгом первом цикле большой доли.
+    """
+    from telegram import Bot
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_IGN)
+    listener = configure_logging(
+        None if LOG_FILE is None else f'{LOG_FILE}.{shard}'
+    )
+    subscriptions = load_registry(int(time.time()))
+    engine = PollingEngine(
+        Bot(token=TELEGRAM_TOKEN), SubscriptionRegistry(),
+        state_store=create_state_store(STATE_DB),
+        session=create_api_session(
+            POLL_CONCURRENCY,
+            None if RECORD_FILE is None else f'{RECORD_FILE}.{shard}'
+        ),
+        shares=SHARDS * DYNO_COUNT
+    )
+    engine.assign(shard_registry(subscriptions, live_shards, shard))
+
+    def load():
+        nonlocal subscriptions
+        subscriptions = load_registry(int(time.time())).reuse(subscriptions)
+        return shard_registry(subscriptions, live_shards, shard)
+
+    if METRICS_PORT is not None:
+        engine.register_metrics()
+        metrics.start_metrics_server(int(METRICS_PORT) + shard + 1,
+                                     METRICS_HOST)
+    try:
+        while True:
+            engine.step(SHARD_BATCH)
+            health.put((shard, os.getpid(), time.time(),
+                        engine.stats['polls'], len(engine.registry)))
+            try:
+                message = control.get(timeout=min(
+                    engine.wait_time(), HEARTBEAT_INTERVAL
+                ))
+            except queue.Empty:
+                continue
+            if message is None:
+                logger.info(SHUTDOWN)
+                return
+            if message == RELOAD:
+                engine.reload(load)
+                continue
+            live_shards = message
+            moved = engine.assign(
+                shard_registry(subscriptions, live_shards, shard)
+            )
+            logger.info(SHARD_ASSIGNED.format(
+                shard=shard, live=live_shards, count=len(engine.registry),
+                moved=moved
+            ))
+    finally:
+        engine.close()
+        if listener is not None:
+            listener.stop()
+
+
+def configure_logging(path=LOG_FILE):
+    """Настройка журнала процесса по переменным окружения."""
+    return setup_logging(
+        path,
+        level=LOG_LEVEL,
+        json_format=LOG_JSON,
+        use_queue=LOG_QUEUE,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUPS,
+        repeat_window=LOG_REPEAT_WINDOW,
+    )
+
+
 def main():
     """Основная логика работы бота."""
+    from telegram import Bot
+
     if not check_tokens():
         raise ValueError(TOKENS_ERROR)
+    if SHARDS > 1:
+        supervisor = Supervisor(
+            run_worker, SHARDS, heartbeat_timeout=HEARTBEAT_TIMEOUT
+        )
+        install_signal_handlers(supervisor.request_stop, supervisor.reload)
+        supervisor.run()
+        return
     bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    cash_message_error = None
-    cash_message = None
-
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if len(homeworks) == 0:
-                message = EMPTY_RESPONSE
-            else:
-                message = parse_status(homeworks[0])
-            if cash_message != message:
-                send_message(bot, message)
-                cash_message = message
-            current_timestamp = (response.get('current_date',
-                                 current_timestamp))
-            cash_message_error = None
-
-        except Exception as error:
-            message = MAIN_ERROR.format(error=error)
-            logger.error(message)
-            if cash_message_error != str(error):
-                try:
-                    send_message(bot, message)
-                    cash_message_error = str(error)
-                except TelegramError as error:
-                    logger.exception(
-                        ERROR_SEND.format(error=error, message=message)
-                    )
-        time.sleep(RETRY_TIME)
+    registry = shard_registry(load_registry(int(time.time())), [0], 0)
+    if not len(registry):
+        raise ValueError(NO_SUBSCRIPTIONS)
+    state_store = create_state_store(STATE_DB)
+    logger.info(STATE_RESTORED.format(count=state_store.restore(registry)))
+    engine = PollingEngine(
+        bot, registry, state_store=state_store, shares=DYNO_COUNT
+    )
+    if METRICS_PORT is not None:
+        engine.register_metrics()
+        metrics.start_metrics_server(int(METRICS_PORT), METRICS_HOST)
+    updater = start_updates(engine)
+    install_signal_handlers(engine.stop, engine.request_reload)
+    try:
+        engine.run(lambda: shard_registry(
+            load_registry(int(time.time())), [0], 0
+        ))
+    finally:
+        if updater is not None:
+            updater.stop()
 
 
 if __name__ == '__main__':
-    path = os.path.expanduser('~')
-    logging.basicConfig(
-        filename=os.path.join(path, 'main.log'),
-        filemode='w',
-        format=('%(asctime)s - %(funcName)s - '
-                '%(name)s - %(levelname)s - %(message)s'),
-        level=logging.DEBUG
-    )
-    main()
+    listener = configure_logging()
+    try:
+        main()
+    finally:
+        if listener is not None:
+            listener.stop()
@@ -0,0 +1,73 @@
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+EXPECTED = 'Ожидался символ {expected!r}'
+OBJECT_KEY = 'Ожидалась строка-ключ объекта'
+
+
+class JsonReader:
+    """Последовательное чтение JSON-текста по одному значению.
+
+    Вложенные значения разбираются json.JSONDecoder целиком, а члены
+    объекта и элементы массива верхнего уровня отдаются по одному,
+    поэтому чтение можно прервать, не разбирая остаток текста.
+    """
+
+    def __init__(self, text):
+        """Чтение текста с начала."""
+        self.text = text
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def peek(self):
+        """Следующий значащий символ без продвижения, '' в конце."""
+        self.pos = WHITESPACE.match(self.text, self.pos).end()
+        return self.text[self.pos:self.pos + 1]
+
+    def expect(self, expected):
+        """Пропуск обязательного символа."""
+        if self.peek() != expected:
+            raise json.JSONDecodeError(
+                EXPECTED.format(expected=expected), self.text, self.pos
+            )
+        self.pos += 1
+
+    def value(self):
+        """Разбор одного значения целиком."""
+        self.peek()
+        value, self.pos = self.decoder.raw_decode(self.text, self.pos)
+        return value
+
+    def members(self):
+        """Ключи объекта по одному; значение читает вызывающий код."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise json.JSONDecodeError(OBJECT_KEY, self.text, self.pos)
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self._separator('}'):
+                return
+
+    def items(self):
+        """Элементы массива по одному."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._separator(']'):
+                return
+
+    def _separator(self, closing):
+        if self.peek() == closing:
+            self.pos += 1
+            return True
+        self.expect(',')
+        return False
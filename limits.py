@@ -0,0 +1,126 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Маркерная корзина: в среднем не больше rate событий в секунду."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """Корзина со скоростью пополнения rate и запасом capacity."""
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.clock = clock
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1, max_delay=None):
+        """Резерв маркеров, возвращает задержку до их появления.
+
+        С max_delay маркеры, которых пришлось бы ждать max_delay секунд
+        или дольше, не резервируются: тогда возвращается None.
+        """
+        with self._lock:
+            self._refill()
+            delay = max(0.0, (tokens - self.tokens) / self.rate)
+            if max_delay is not None and delay >= max_delay:
+                return None
+            self.tokens -= tokens
+            return delay
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+BREAKER_STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class CircuitBreaker:
+    """Предохранитель: размыкается после серии сбоев подряд.
+
+    В разомкнутом состоянии запросы отклоняются до истечения
+    reset_timeout, затем пропускается probes пробных запросов. Успех проб
+    замыкает предохранитель, сбой размыкает его снова.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60, probes=1,
+                 clock=time.monotonic):
+        """Предохранитель с порогом сбоев и паузой перед пробами."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.stats = {'opened': 0, 'rejected': 0, 'probes': 0}
+        self._in_flight = 0
+        self._succeeded = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли выполнить запрос сейчас."""
+        with self._lock:
+            now = self.clock()
+            if self.state == OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    self.stats['rejected'] += 1
+                    return False
+                self._half_open(now)
+            if self.state == HALF_OPEN:
+                if now - self.opened_at >= self.reset_timeout:
+                    self._half_open(now)
+                if self._in_flight >= self.probes:
+                    self.stats['rejected'] += 1
+                    return False
+                self._in_flight += 1
+                self.stats['probes'] += 1
+            return True
+
+    def record_success(self):
+        """Учёт успешного запроса."""
+        with self._lock:
+            self.failures = 0
+            if self.state != HALF_OPEN:
+                return
+            self._in_flight -= 1
+            self._succeeded += 1
+            if self._succeeded >= self.probes:
+                self.state = CLOSED
+
+    def record_failure(self):
+        """Учёт сбоя запроса."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                self.failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def metrics(self):
+        """Состояние предохранителя для метрик."""
+        with self._lock:
+            return dict(
+                self.stats,
+                state=BREAKER_STATES.index(self.state),
+                failures=self.failures,
+            )
+
+    def _open(self):
+        if self.state != OPEN:
+            self.stats['opened'] += 1
+        self.state = OPEN
+        self.opened_at = self.clock()
+
+    def _half_open(self, now):
+        self.state = HALF_OPEN
+        self.opened_at = now
+        self._in_flight = 0
+        self._succeeded = 0
@@ -0,0 +1,118 @@
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = ('%(asctime)s - %(funcName)s - '
+               '%(name)s - %(levelname)s - %(message)s')
+REPEATED = '{message} (повторилось ещё {count} раз за {window} c)'
+NUMBERS = re.compile(r'\d+')
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+PRUNE_SIZE = 1000
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись журнала одной строкой JSON с полями контекста из extra."""
+
+    def format(self, record):
+        """JSON-строка записи."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'name': record.name,
+            'function': record.funcName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_FIELDS:
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RepeatFilter(logging.Filter):
+    """Ограничение повторов одинаковых предупреждений и ошибок.
+
+    Сообщения сравниваются без чисел, поэтому ошибки, отличающиеся
+    только метками времени, считаются одинаковыми. За окно window
+    пропускается burst записей, о пропущенных сообщает первая запись
+    следующего окна.
+    """
+
+    def __init__(self, window=60, burst=1, clock=time.monotonic):
+        """Фильтр с окном в секундах и числом записей на окно."""
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.clock = clock
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        """Пропускать ли запись."""
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.levelno, NUMBERS.sub('#', record.getMessage()))
+        now = self.clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                return entry[1] <= self.burst
+            if entry is not None and entry[1] > self.burst:
+                record.msg = REPEATED.format(
+                    message=record.getMessage(),
+                    count=entry[1] - self.burst,
+                    window=self.window,
+                )
+                record.args = None
+            self._prune(now)
+            self._seen[key] = [now, 1]
+        return True
+
+    def _prune(self, now):
+        if len(self._seen) < PRUNE_SIZE:
+            return
+        for key, (started, _) in list(self._seen.items()):
+            if now - started >= self.window:
+                del self._seen[key]
+
+
+def setup_logging(path=None, level=logging.DEBUG, json_format=False,
+                  use_queue=True, max_bytes=10 * 1024 * 1024,
+                  backup_count=5, repeat_window=60, repeat_burst=1):
+    """Настройка корневого журнала: stdout и файл с ротацией.
+
+    При use_queue запись в файл и stdout выполняет отдельный поток, а
+    вызывающий код только кладёт запись в очередь. Возвращает
+    QueueListener, который нужно остановить при завершении, или None.
+    """
+    formatter = (JsonFormatter() if json_format
+                 else logging.Formatter(TEXT_FORMAT))
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if path is not None:
+        handlers.append(RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    listener = None
+    if use_queue:
+        listener = QueueListener(queue.SimpleQueue(), *handlers)
+        handlers = [QueueHandler(listener.queue)]
+        listener.start()
+    for handler in handlers:
+        if repeat_window:
+            handler.addFilter(RepeatFilter(repeat_window, repeat_burst))
+        root.addHandler(handler)
+    return listener
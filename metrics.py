@@ -0,0 +1,186 @@
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_SERVER_STARTED = 'Метрики доступны на http://{host}:{port}/metrics'
+
+
+def format_labels(names, values):
+    """Метки в формате Prometheus: {name="value",...}."""
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class MetricsRegistry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus."""
+
+    def __init__(self):
+        """Создание пустого набора."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Регистрация метрики, одноимённая заменяется."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        """Метрика по имени."""
+        return self._metrics.get(name)
+
+    def render(self):
+        """Текст всех метрик для ответа на /metrics."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Counter:
+    """Монотонный счётчик с необязательными метками."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        """Счётчик с именем, описанием и именами меток."""
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        """Увеличение счётчика."""
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Текущее значение счётчика."""
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self):
+        """Строки значений для экспорта."""
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f'{self.name}{format_labels(self.labels, key)} {value}'
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS,
+                 registry=REGISTRY):
+        """Гистограмма с именем, описанием и верхними границами корзин."""
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def observe(self, value):
+        """Учёт одного наблюдения."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        """Строки корзин, суммы и количества для экспорта."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_sum {total}')
+        lines.append(f'{self.name}_count {count}')
+        return lines
+
+
+class CallbackMetric:
+    """Метрика, значения которой читаются функцией в момент экспорта.
+
+    Функция возвращает число или словарь {значение метки: число}.
+    """
+
+    def __init__(self, name, help, function, kind='gauge', label=None,
+                 registry=REGISTRY):
+        """Метрика с функцией чтения значения."""
+        self.name = name
+        self.help = help
+        self.function = function
+        self.kind = kind
+        self.label = label
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self):
+        """Строки значений для экспорта."""
+        values = self.function()
+        if not isinstance(values, dict):
+            return [f'{self.name} {values}']
+        return [
+            f'{self.name}{format_labels((self.label,), (key,))} {value}'
+            for key, value in values.items()
+        ]
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Запуск HTTP-сервера метрик в фоновом потоке."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(METRICS_SERVER_STARTED.format(
+        host=host, port=server.server_address[1]
+    ))
+    return server
@@ -0,0 +1,194 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+from limits import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RETRY_SEND = ('Повтор отправки в чат {chat_id} через {delay} c '
+              'после ошибки: {error}')
+OUTBOX_DROPPED = ('За {timeout} c не отправлено сообщений: {count}, '
+                  'они будут потеряны')
+PRUNE_SIZE = 10000
+STOP = object()
+
+
+class Outbox:
+    """Очередь исходящих сообщений с пулом отправителей.
+
+    Соблюдает общий лимит Telegram и интервал между сообщениями в один
+    чат, выполняет RetryAfter, повторяет сетевые ошибки с растущей
+    задержкой и склеивает накопившиеся сообщения одного чата.
+
+    Отправлять можно не только в Telegram: send других приёмников
+    сообщает о временном сбое через OSError (в том числе ConnectionError),
+    а о постоянном - через ValueError.
+    """
+
+    def __init__(self, send, workers=4, rate=30, chat_interval=1.0,
+                 retries=3, backoff=1.0, limit=4096, separator='\n\n',
+                 on_error=None, close_timeout=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        """Очередь с функцией отправки send(chat_id, text)."""
+        self.send = send
+        self.close_timeout = close_timeout
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.limit = limit
+        self.separator = separator
+        self.on_error = on_error
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.stats = Counter()
+        self._pending = {}
+        self._next_send = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Запуск потоков-отправителей."""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, chat_id, message):
+        """Постановка сообщения в очередь чата."""
+        with self._lock:
+            self.stats['queued'] += 1
+            pending = self._pending.get(chat_id)
+            if pending is not None:
+                pending.append(message)
+                return
+            self._pending[chat_id] = deque([message])
+        self._ready.put(chat_id)
+
+    @property
+    def depth(self):
+        """Число сообщений, ожидающих отправки."""
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+    def join(self, timeout=None):
+        """Ожидание отправки всех сообщений; False, если не успели."""
+        with self._ready.all_tasks_done:
+            return self._ready.all_tasks_done.wait_for(
+                lambda: not self._ready.unfinished_tasks, timeout
+            )
+
+    def close(self):
+        """Отправка остатка очереди и остановка потоков.
+
+        Ждёт не дольше close_timeout; если отправка не успела, потоки
+        остаются дорабатывать, а число неотправленных сообщений
+        возвращается и пишется в журнал.
+        """
+        if not self.join(self.close_timeout):
+            dropped = self.depth
+            logger.error(OUTBOX_DROPPED.format(
+                timeout=self.close_timeout, count=dropped
+            ))
+            return dropped
+        for _ in self._threads:
+            self._ready.put(STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return 0
+
+    def _work(self):
+        while True:
+            chat_id = self._ready.get()
+            try:
+                if chat_id is STOP:
+                    return
+                self._deliver(chat_id)
+            except Exception as error:
+                logger.exception(error)
+            finally:
+                self._ready.task_done()
+
+    def _deliver(self, chat_id):
+        delay = self._next_send.get(chat_id, 0) - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        text = self._take(chat_id)
+        try:
+            self._send(chat_id, text)
+        finally:
+            with self._lock:
+                self._next_send[chat_id] = self.clock() + self.chat_interval
+                if self._pending[chat_id]:
+                    self._ready.put(chat_id)
+                else:
+                    del self._pending[chat_id]
+                    self._prune()
+
+    def _take(self, chat_id):
+        with self._lock:
+            pending = self._pending[chat_id]
+            messages = [pending.popleft()]
+            size = len(messages[0])
+            while pending and (
+                size + len(self.separator) + len(pending[0]) <= self.limit
+            ):
+                size += len(self.separator) + len(pending[0])
+                messages.append(pending.popleft())
+        self.stats['coalesced'] += len(messages) - 1
+        return self.separator.join(messages)
+
+    def _send(self, chat_id, text):
+        from telegram.error import RetryAfter, TelegramError
+
+        attempt = 0
+        while True:
+            self.sleep(self.bucket.reserve())
+            try:
+                self.send(chat_id, text)
+                self.stats['sent'] += 1
+                return
+            except (TelegramError, OSError, ValueError) as error:
+                attempt += not isinstance(error, RetryAfter)
+                delay = self._retry_delay(error, attempt)
+                if delay is None:
+                    return self._fail(chat_id, text, error)
+                logger.warning(RETRY_SEND.format(
+                    chat_id=chat_id, delay=delay, error=error
+                ))
+            self.sleep(delay)
+
+    def _retry_delay(self, error, attempt):
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+
+        if isinstance(error, RetryAfter):
+            self.stats['retry_after'] += 1
+            return error.retry_after
+        if isinstance(error, BadRequest) or not isinstance(
+            error, (NetworkError, OSError)
+        ):
+            return None
+        if attempt > self.retries:
+            return None
+        self.stats['retried'] += 1
+        return self.backoff * 2 ** (attempt - 1)
+
+    def _fail(self, chat_id, text, error):
+        self.stats['failed'] += 1
+        if self.on_error is not None:
+            self.on_error(chat_id, text, error)
+
+    def _prune(self):
+        if len(self._next_send) <= PRUNE_SIZE:
+            return
+        now = self.clock()
+        for chat_id, when in list(self._next_send.items()):
+            if when <= now:
+                del self._next_send[chat_id]
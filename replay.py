@@ -0,0 +1,227 @@
+import bisect
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, Future
+
+REPLAY_MISSING = 'В записи нет ответов для токена {key}'
+
+
+def token_key(headers):
+    """Обезличенный ключ токена из заголовка Authorization."""
+    token = headers['Authorization'].split(' ', 1)[1]
+    return hashlib.blake2b(token.encode(), digest_size=8).hexdigest()
+
+
+def read_records(path):
+    """Записи ответов API из файла записи по порядку.
+
+    Файл процесса, завершённого без close, обрывается на незакрытом
+    члене gzip или недописанной строке: чтение на этом месте
+    прекращается, и записи до обрыва остаются пригодными.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        try:
+            for line in file:
+                if not line.endswith('\n'):
+                    return
+                yield json.loads(line)
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            return
+
+
+class RecordingSession:
+    """Обёртка над сессией requests, записывающая ответы API.
+
+    Каждый ответ дописывается в конец gzip-файла одной JSON-строкой:
+    время, обезличенный ключ токена, from_date, статус, валидаторы и тело.
+    Сам токен в запись не попадает. После каждой строки поток сжатия
+    сбрасывается на диск, так что при гибели процесса без close теряется
+    только конец gzip, а не вся запись.
+    """
+
+    def __init__(self, session, path, clock=time.time):
+        """Запись ответов session в файл path."""
+        self.session = session
+        self.clock = clock
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Запрос через исходную сессию с записью ответа или ошибки."""
+        record = {
+            't': self.clock(),
+            'key': token_key(headers),
+            'from_date': (params or {}).get('from_date'),
+        }
+        try:
+            response = self.session.get(
+                url, headers=headers, params=params, **kwargs
+            )
+        except Exception as error:
+            record['error'] = str(error)
+            self._write(record)
+            raise
+        record.update(
+            status=response.status_code,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            body=response.content.decode('utf-8'),
+        )
+        self._write(record)
+        return response
+
+    def close(self):
+        """Запись остатка файла и закрытие сессии."""
+        with self._lock:
+            self._file.close()
+        self.session.close()
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+
+class SimulatedClock:
+    """Виртуальные часы: sleep не ждёт, а переводит время вперёд."""
+
+    def __init__(self, start=0.0):
+        """Часы, показывающие start секунд."""
+        self.now = start
+        self._lock = threading.Lock()
+
+    def time(self):
+        """Текущее виртуальное время."""
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        """Перевод часов на seconds секунд вперёд."""
+        with self._lock:
+            self.now += max(0, seconds)
+
+
+class ReplayResponse:
+    """Ответ API, восстановленный из записи."""
+
+    def __init__(self, status_code, headers, content):
+        """Ответ со статусом, заголовками и телом в байтах."""
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        """Разбор тела как JSON."""
+        return json.loads(self.content)
+
+
+class ReplaySession:
+    """Сессия, отвечающая записанными ответами по виртуальному времени.
+
+    На запрос в момент t отдаётся последний ответ для токена, записанный
+    не позже t, поэтому опрос чаще или реже исходного видит ту же
+    последовательность изменений. Токенами служат обезличенные ключи
+    записи. Совпавший If-None-Match даёт ответ 304.
+    """
+
+    def __init__(self, records, clock):
+        """Сессия по записям ответов и виртуальным часам."""
+        self.clock = clock
+        self.requests = 0
+        self._timelines = defaultdict(list)
+        for record in sorted(records, key=lambda record: record['t']):
+            self._timelines[record['key']].append(record)
+        self._times = {
+            key: [record['t'] for record in timeline]
+            for key, timeline in self._timelines.items()
+        }
+
+    @property
+    def keys(self):
+        """Ключи токенов, для которых есть записи."""
+        return list(self._timelines)
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Записанный ответ на момент виртуального времени."""
+        self.requests += 1
+        key = headers['Authorization'].split(' ', 1)[1]
+        if key not in self._timelines:
+            raise KeyError(REPLAY_MISSING.format(key=key))
+        index = bisect.bisect_right(self._times[key], self.clock.time())
+        record = self._timelines[key][max(0, index - 1)]
+        if 'error' in record:
+            import requests
+
+            raise requests.ConnectionError(record['error'])
+        validators = {
+            name: record[field]
+            for name, field in (
+                ('ETag', 'etag'), ('Last-Modified', 'last_modified')
+            )
+            if record.get(field) is not None
+        }
+        etag = validators.get('ETag')
+        if etag is not None and headers.get('If-None-Match') == etag:
+            return ReplayResponse(304, validators, b'')
+        return ReplayResponse(
+            record['status'], validators, record['body'].encode('utf-8')
+        )
+
+    def close(self):
+        """Закрытие не требуется."""
+
+
+class InlineExecutor(Executor):
+    """Исполнитель, вызывающий функцию сразу в вызывающем потоке.
+
+    Записанные ответы отдаются мгновенно, а без потоков запросы, сбои и
+    уведомления идут в порядке задач цикла, и прогон воспроизводим.
+    """
+
+    def submit(self, function, *args, **kwargs):
+        """Уже выполненный вызов function."""
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+class ReplayOutbox:
+    """Очередь уведомлений прогона: сообщения запоминаются со временем."""
+
+    depth = 0
+
+    def __init__(self, clock):
+        """Очередь, отмечающая сообщения временем clock."""
+        self.clock = clock
+        self.sent = []
+        self.stats = Counter()
+
+    def put(self, chat_id, message):
+        """Запоминание уведомления."""
+        self.stats['sent'] += 1
+        self.sent.append((self.clock.time(), chat_id, message))
+
+    def join(self, timeout=None):
+        """Все сообщения уже «отправлены»."""
+        return True
+
+    def close(self):
+        """Потерянных сообщений не бывает."""
+        return 0
+
+
+def drive(engine, clock, until, min_step=0.001):
+    """Прогон движка на виртуальных часах до момента until."""
+    while clock.time() < until:
+        engine.step()
+        clock.sleep(max(engine.wait_time(), min_step))
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import random
+import time
+
+HOUR = 3600
+
+
+class AdaptiveScheduler:
+    """Очередь опросов с приоритетом по времени следующего опроса.
+
+    Интервал подписки сокращается после изменения статуса и на время
+    ревью, а при отсутствии изменений растёт экспоненциально. Общее число
+    опросов в час ограничивается бюджетом запросов к API.
+    """
+
+    def __init__(self, idle_interval, min_interval, reviewing_interval,
+                 max_interval, backoff=2, jitter=0.1, budget=0,
+                 clock=time.monotonic, rand=random.random):
+        """Планировщик с интервалами опроса в секундах и бюджетом в час."""
+        self.idle_interval = idle_interval
+        self.min_interval = min_interval
+        self.reviewing_interval = reviewing_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.budget = budget
+        self.clock = clock
+        self.rand = rand
+        self._heap = []
+        self._due = {}
+        self._intervals = {}
+        self._counter = itertools.count()
+        self._allowance = float(budget)
+        self._checked_at = clock()
+
+    def configure(self, **settings):
+        """Смена интервалов, разброса или бюджета на ходу.
+
+        Уже назначенные опросы не переносятся, новые интервалы действуют
+        со следующего планирования.
+        """
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(name)
+            setattr(self, name, value)
+        self._allowance = min(self._allowance, self.budget)
+
+    def add(self, key, due=None):
+        """Постановка подписки в очередь, по умолчанию на сейчас."""
+        if key in self._due:
+            return
+        self._push(key, self.clock() if due is None else due)
+
+    def remove(self, key):
+        """Удаление подписки из очереди."""
+        self._due.pop(key, None)
+        self._intervals.pop(key, None)
+
+    def prioritize(self, key):
+        """Перенос опроса подписки на сейчас, вне обычного интервала."""
+        self._push(key, self.clock())
+
+    def sync(self, keys):
+        """Приведение очереди к набору ключей реестра.
+
+        Новые ключи встают в очередь в порядке реестра, а не множества,
+        чтобы порядок опросов не зависел от хэширования строк.
+        """
+        keys = dict.fromkeys(keys)
+        for key in [key for key in self._due if key not in keys]:
+            self.remove(key)
+        for key in keys:
+            self.add(key)
+
+    def reschedule(self, key, changed=False, reviewing=False):
+        """Выбор времени следующего опроса по активности подписки."""
+        if changed:
+            interval = self.min_interval
+        elif reviewing:
+            interval = self.reviewing_interval
+        else:
+            interval = min(
+                self.max_interval,
+                self._intervals.get(key, self.idle_interval / self.backoff)
+                * self.backoff
+            )
+        self._intervals[key] = interval
+        spread = 1 + self.jitter * (2 * self.rand() - 1)
+        self._push(key, self.clock() + interval * spread)
+        return interval
+
+    def pop_due(self, now=None, limit=None):
+        """Извлечение подписок, которым пора на опрос, в рамках бюджета.
+
+        С limit извлекается не больше limit самых давних подписок,
+        остальные остаются в очереди до следующего вызова.
+        """
+        now = self.clock() if now is None else now
+        self._refill(now)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            if self.budget and self._allowance < 1:
+                break
+            if limit is not None and len(due) >= limit:
+                break
+            when, _, key = heapq.heappop(self._heap)
+            if self._due.get(key) != when:
+                continue
+            del self._due[key]
+            if self.budget:
+                self._allowance -= 1
+            due.append(key)
+        return due
+
+    def wait_time(self, now=None):
+        """Сколько секунд ждать до ближайшего опроса."""
+        now = self.clock() if now is None else now
+        self._drop_stale()
+        if not self._heap:
+            return self.idle_interval
+        wait = self._heap[0][0] - now
+        if self.budget and self._allowance < 1:
+            wait = max(wait, (1 - self._allowance) * HOUR / self.budget)
+        return max(0, wait)
+
+    def __len__(self):
+        """Количество подписок в очереди."""
+        return len(self._due)
+
+    def _push(self, key, due):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][2]) != (
+            self._heap[0][0]
+        ):
+            heapq.heappop(self._heap)
+
+    def _refill(self, now):
+        if self.budget:
+            self._allowance = min(
+                self.budget,
+                self._allowance + (now - self._checked_at) * self.budget / HOUR
+            )
+        self._checked_at = now
@@ -0,0 +1,213 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RELOAD = 'reload'
+
+WORKER_STARTED = 'Запущен обработчик доли {shard}, pid {pid}'
+WORKER_DIED = ('Обработчик доли {shard} не отвечает или завершился, '
+               'его подписки переданы долям {live}')
+WORKER_HEALTH = ('Доля {shard}: pid {pid}, подписок {subscriptions}, '
+                 'опросов {polls}')
+
+
+def stable_hash(value):
+    """Хэш строки, одинаковый во всех процессах и запусках."""
+    return int.from_bytes(
+        hashlib.md5(value.encode()).digest()[:8], 'big'
+    )
+
+
+class HashRing:
+    """Кольцо согласованного хэширования ключей по долям."""
+
+    def __init__(self, nodes=(), replicas=100):
+        """Кольцо с replicas виртуальными точками на долю."""
+        self.replicas = replicas
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавление доли в кольцо."""
+        for replica in range(self.replicas):
+            point = stable_hash(f'{node}:{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def node_for(self, key):
+        """Доля, которой принадлежит ключ."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, stable_hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class WorkerHandle:
+    """Процесс-обработчик доли и его последний отчёт о здоровье."""
+
+    def __init__(self, process, control, started_at):
+        """Дескриптор процесса с очередью управления."""
+        self.process = process
+        self.control = control
+        self.last_seen = started_at
+        self.report = None
+
+
+class Supervisor:
+    """Запуск обработчиков долей, контроль здоровья и перебалансировка.
+
+    Обработчик вызывается как target(shard, live_shards, control,
+    health): по control приходит новый список живых долей, RELOAD для
+    перечитывания настроек или None для остановки, в health обработчик
+    кладёт кортежи
+    (shard, pid, время, опросов, подписок).
+    """
+
+    def __init__(self, target, shards, heartbeat_timeout=60,
+                 restart_delay=5, check_interval=1, log_interval=60,
+                 context=None, clock=time.monotonic, kill_timeout=5):
+        """Надзиратель за shards процессами target."""
+        self.target = target
+        self.kill_timeout = kill_timeout
+        self.shards = shards
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        self.check_interval = check_interval
+        self.log_interval = log_interval
+        self.context = context or multiprocessing.get_context('fork')
+        self.clock = clock
+        self.health = self.context.Queue()
+        self.workers = {}
+        self.live = set()
+        self.restarts = {}
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Запуск обработчиков всех долей."""
+        self.live = set(range(self.shards))
+        for shard in range(self.shards):
+            self.spawn(shard)
+        return self
+
+    def spawn(self, shard):
+        """Запуск процесса для доли."""
+        control = self.context.Queue()
+        process = self.context.Process(
+            target=self.target,
+            args=(shard, sorted(self.live), control, self.health),
+            name=f'shard-{shard}',
+        )
+        process.start()
+        self.workers[shard] = WorkerHandle(process, control, self.clock())
+        logger.info(WORKER_STARTED.format(shard=shard, pid=process.pid))
+
+    def broadcast(self):
+        """Рассылка актуального списка живых долей."""
+        self.send(sorted(self.live))
+
+    def send(self, message):
+        """Отправка управляющего сообщения всем обработчикам."""
+        for worker in self.workers.values():
+            worker.control.put(message)
+
+    def reload(self):
+        """Команда обработчикам перечитать настройки и подписки."""
+        self.send(RELOAD)
+
+    def request_stop(self):
+        """Завершение цикла надзора; безопасно из обработчика сигнала."""
+        self.stopping.set()
+
+    def check(self):
+        """Приём отчётов и обработка упавших и зависших процессов."""
+        self.collect_health()
+        now = self.clock()
+        for shard, worker in list(self.workers.items()):
+            if (not worker.process.is_alive()
+                    or now - worker.last_seen > self.heartbeat_timeout):
+                self.handle_death(shard)
+
+    def collect_health(self):
+        """Чтение накопившихся отчётов о здоровье."""
+        while True:
+            try:
+                report = self.health.get_nowait()
+            except queue.Empty:
+                return
+            worker = self.workers.get(report[0])
+            if worker is not None and worker.process.pid == report[1]:
+                worker.last_seen = self.clock()
+                worker.report = report
+
+    def handle_death(self, shard):
+        """Перераспределение подписок упавшей доли и отложенный рестарт."""
+        worker = self.workers.pop(shard)
+        if worker.process.is_alive():
+            worker.process.terminate()
+        self.halt(worker, self.kill_timeout)
+        self.live.discard(shard)
+        logger.error(WORKER_DIED.format(shard=shard, live=sorted(self.live)))
+        self.broadcast()
+        self.restarts[shard] = self.clock() + self.restart_delay
+
+    def restart_due(self):
+        """Перезапуск долей, у которых истекла пауза."""
+        now = self.clock()
+        for shard, when in list(self.restarts.items()):
+            if when <= now:
+                del self.restarts[shard]
+                self.live.add(shard)
+                self.broadcast()
+                self.spawn(shard)
+
+    def log_health(self):
+        """Запись последних отчётов обработчиков в журнал."""
+        for worker in self.workers.values():
+            if worker.report is not None:
+                shard, pid, _, polls, subscriptions = worker.report
+                logger.debug(WORKER_HEALTH.format(
+                    shard=shard, pid=pid, polls=polls,
+                    subscriptions=subscriptions
+                ))
+
+    def run(self):
+        """Цикл надзора до вызова request_stop."""
+        self.start()
+        logged = self.clock()
+        try:
+            while not self.stopping.wait(self.check_interval):
+                self.check()
+                self.restart_due()
+                if self.clock() - logged >= self.log_interval:
+                    self.log_health()
+                    logged = self.clock()
+        finally:
+            self.stop()
+
+    def stop(self, timeout=30):
+        """Остановка всех обработчиков."""
+        self.send(None)
+        for worker in self.workers.values():
+            self.halt(worker, timeout)
+        self.workers = {}
+
+    def halt(self, worker, timeout):
+        """Ожидание выхода процесса, по истечении timeout - SIGKILL.
+
+        Обработчики игнорируют SIGTERM, поэтому зависший процесс
+        завершается только так, иначе он продолжил бы опрос своих
+        подписок параллельно с их новой долей.
+        """
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
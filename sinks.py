@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+WEBHOOK_STATUS_ERROR = 'Вебхук {url} ответил статусом {status_code}'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class WebhookSink:
+    """Доставка уведомлений POST-запросом с JSON {chat_id, text}.
+
+    Сетевые ошибки и статусы из RETRY_STATUSES поднимаются как
+    ConnectionError, чтобы очередь повторила отправку; прочие ошибочные
+    статусы не повторяются.
+    """
+
+    def __init__(self, url, session=None, timeout=10):
+        """Приёмник с адресом вебхука и таймаутом запроса в секундах."""
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+
+    def send(self, chat_id, text):
+        """Отправка одного уведомления."""
+        if self.session is None:
+            import requests
+
+            self.session = requests.Session()
+        response = self.session.post(
+            self.url, json={'chat_id': chat_id, 'text': text},
+            timeout=self.timeout
+        )
+        if response.status_code < 400:
+            return
+        message = WEBHOOK_STATUS_ERROR.format(
+            url=self.url, status_code=response.status_code
+        )
+        if response.status_code in RETRY_STATUSES:
+            raise ConnectionError(message)
+        raise ValueError(message)
+
+
+class FileSink:
+    """Запись уведомлений в файл: одна JSON-строка на сообщение.
+
+    Файл служит локальной очередью: его можно читать tail -f или
+    отдельным процессом-потребителем.
+    """
+
+    def __init__(self, path, clock=time.time):
+        """Приёмник, дописывающий строки в конец файла path."""
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def send(self, chat_id, text):
+        """Дозапись одного уведомления."""
+        line = json.dumps(
+            {'time': self.clock(), 'chat_id': chat_id, 'text': text},
+            ensure_ascii=False
+        )
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+
+class Fanout:
+    """Рассылка каждого сообщения в несколько очередей-приёмников.
+
+    У каждого приёмника своя очередь Outbox со своими потоками, лимитом
+    и окном склейки сообщений, поэтому медленный или недоступный приёмник
+    копит только собственную очередь и не задерживает остальные.
+    """
+
+    def __init__(self, outboxes):
+        """Рассылка по словарю имя приёмника -> очередь."""
+        self.outboxes = dict(outboxes)
+
+    def put(self, chat_id, message):
+        """Постановка сообщения в очереди всех приёмников."""
+        for outbox in self.outboxes.values():
+            outbox.put(chat_id, message)
+
+    @property
+    def depth(self):
+        """Число сообщений, ожидающих отправки, по всем приёмникам."""
+        return sum(outbox.depth for outbox in self.outboxes.values())
+
+    @property
+    def stats(self):
+        """Сумма счётчиков событий очередей всех приёмников."""
+        return sum(
+            (Counter(outbox.stats) for outbox in self.outboxes.values()),
+            Counter()
+        )
+
+    def join(self, timeout=None):
+        """Ожидание отправки во всех приёмниках; False, если не успели."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = True
+        for outbox in self.outboxes.values():
+            remaining = (
+                None if deadline is None
+                else max(0, deadline - time.monotonic())
+            )
+            done = outbox.join(remaining) and done
+        return done
+
+    def close(self):
+        """Одновременное закрытие всех очередей, число потерянных."""
+        with ThreadPoolExecutor(max_workers=len(self.outboxes)) as pool:
+            return sum(pool.map(
+                lambda outbox: outbox.close(), self.outboxes.values()
+            ))
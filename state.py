@@ -0,0 +1,128 @@
+import hashlib
+import json
+import sqlite3
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS subscription_state (
+    token_hash TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    cursor INTEGER,
+    state TEXT NOT NULL,
+    PRIMARY KEY (token_hash, chat_id)
+)
+'''
+SELECT_STATE = ('SELECT token_hash, chat_id, cursor, state '
+                'FROM subscription_state')
+UPSERT_STATE = '''
+INSERT INTO subscription_state (token_hash, chat_id, cursor, state)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (token_hash, chat_id) DO UPDATE SET
+    cursor = excluded.cursor,
+    state = excluded.state
+'''
+DELETE_STATE = ('DELETE FROM subscription_state '
+                'WHERE token_hash = ? AND chat_id = ?')
+
+
+def state_key(token, chat_id):
+    """Ключ состояния без токена в открытом виде."""
+    return hashlib.sha256(token.encode()).hexdigest(), str(chat_id)
+
+
+class MemoryStateStore:
+    """Хранилище состояния подписок в памяти процесса."""
+
+    def __init__(self):
+        """Создание пустого хранилища."""
+        self._states = {}
+        self._pending = {}
+
+    def save(self, subscription):
+        """Постановка состояния подписки в очередь на запись."""
+        key = state_key(subscription.token, subscription.chat_id)
+        self._pending[key] = subscription.dump_state()
+
+    def forget(self, subscription):
+        """Удаление состояния отписавшейся подписки."""
+        key = state_key(subscription.token, subscription.chat_id)
+        self._pending.pop(key, None)
+        self._delete(key)
+
+    def restore(self, registry):
+        """Восстановление состояния подписок реестра."""
+        states = self._load()
+        restored = 0
+        for subscription in registry:
+            key = state_key(subscription.token, subscription.chat_id)
+            if key in states:
+                subscription.restore_state(states[key])
+                restored += 1
+        return restored
+
+    def flush(self):
+        """Запись накопленных изменений одной пачкой."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        self._write(pending)
+        return len(pending)
+
+    def close(self):
+        """Запись остатка изменений и закрытие хранилища."""
+        self.flush()
+
+    def _load(self):
+        return dict(self._states)
+
+    def _write(self, pending):
+        self._states.update(pending)
+
+    def _delete(self, key):
+        self._states.pop(key, None)
+
+
+class SQLiteStateStore(MemoryStateStore):
+    """Хранилище состояния подписок в файле SQLite."""
+
+    def __init__(self, path):
+        """Открытие базы и создание таблицы состояния."""
+        super().__init__()
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(CREATE_TABLE)
+
+    def close(self):
+        """Запись остатка изменений и закрытие соединения."""
+        super().close()
+        self.connection.close()
+
+    def _load(self):
+        states = {}
+        for token_hash, chat_id, current_timestamp, state in (
+            self.connection.execute(SELECT_STATE)
+        ):
+            state = json.loads(state)
+            state['current_timestamp'] = current_timestamp
+            states[(token_hash, chat_id)] = state
+        return states
+
+    def _write(self, pending):
+        rows = [
+            (token_hash, chat_id, state.get('current_timestamp'),
+             json.dumps(state, ensure_ascii=False))
+            for (token_hash, chat_id), state in pending.items()
+        ]
+        with self.connection:
+            self.connection.executemany(UPSERT_STATE, rows)
+
+    def _delete(self, key):
+        with self.connection:
+            self.connection.execute(DELETE_STATE, key)
+
+
+def create_state_store(path=None):
+    """SQLite-хранилище по пути или хранилище в памяти."""
+    if path is None:
+        return MemoryStateStore()
+    return SQLiteStateStore(path)
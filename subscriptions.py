@@ -0,0 +1,171 @@
+import json
+
+SUBSCRIPTIONS_FILE_ERROR = 'Некорректный файл подписок {path}: {error}'
+SUBSCRIPTION_FIELDS_ERROR = ('В подписке нет обязательных полей '
+                             'token и chat_id: {item}')
+
+
+class Subscription:
+    """Подписка: токен Практикума, чат и состояние опроса.
+
+    Статусы работ хранятся кодами-числами, а последнее изменение - парой
+    (название работы, код статуса): текст сообщения собирается только
+    при отправке. Пока догружается история, backfill хранит контрольную
+    точку [начало следующего окна, конец истории].
+    """
+
+    __slots__ = (
+        'token', 'chat_id', 'current_timestamp', 'last_name',
+        'last_status', 'last_error', 'statuses', 'digest', 'etag',
+        'last_modified', 'checked_at', 'backfill',
+    )
+
+    def __init__(self, token, chat_id, current_timestamp=None):
+        """Создание подписки с пустым состоянием."""
+        self.token = token
+        self.chat_id = chat_id
+        self.current_timestamp = current_timestamp
+        self.last_name = None
+        self.last_status = None
+        self.last_error = None
+        self.statuses = {}
+        self.digest = None
+        self.etag = None
+        self.last_modified = None
+        self.checked_at = None
+        self.backfill = None
+
+    @property
+    def key(self):
+        """Ключ подписки в реестре."""
+        return self.token, self.chat_id
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API с токеном подписки."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    @property
+    def conditional_headers(self):
+        """Заголовки запроса с валидаторами прошлого ответа."""
+        headers = self.headers
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def dump_state(self):
+        """Состояние подписки для сохранения между перезапусками."""
+        return {
+            'current_timestamp': self.current_timestamp,
+            'last_name': self.last_name,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'statuses': self.statuses,
+            'digest': None if self.digest is None else self.digest.hex(),
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'checked_at': self.checked_at,
+            'backfill': self.backfill,
+        }
+
+    def restore_state(self, state):
+        """Восстановление сохранённого состояния подписки."""
+        if state.get('current_timestamp') is not None:
+            self.current_timestamp = state['current_timestamp']
+        self.last_name = state.get('last_name')
+        self.last_status = state.get('last_status')
+        self.last_error = state.get('last_error')
+        self.statuses = dict(state.get('statuses') or {})
+        digest = state.get('digest')
+        self.digest = None if digest is None else bytes.fromhex(digest)
+        self.etag = state.get('etag')
+        self.last_modified = state.get('last_modified')
+        self.checked_at = state.get('checked_at')
+        backfill = state.get('backfill')
+        self.backfill = None if backfill is None else list(backfill)
+
+
+class SubscriptionRegistry:
+    """Реестр подписок: (токен, чат) -> состояние подписки."""
+
+    def __init__(self):
+        """Создание пустого реестра."""
+        self._subscriptions = {}
+
+    def add(self, token, chat_id, current_timestamp=None):
+        """Добавление подписки, существующая возвращается как есть."""
+        key = (token, chat_id)
+        if key not in self._subscriptions:
+            self._subscriptions[key] = Subscription(
+                token, chat_id, current_timestamp
+            )
+        return self._subscriptions[key]
+
+    def get(self, token, chat_id):
+        """Поиск подписки по токену и чату."""
+        return self._subscriptions.get((token, chat_id))
+
+    def load(self, path, current_timestamp=None):
+        """Загрузка подписок из JSON-файла со списком token/chat_id."""
+        for token, chat_id in read_subscriptions(path):
+            self.add(token, chat_id, current_timestamp)
+        return self
+
+    def for_chat(self, chat_id):
+        """Подписки чата; идентификатор сравнивается как строка."""
+        return [
+            subscription for subscription in self
+            if str(subscription.chat_id) == str(chat_id)
+        ]
+
+    def reuse(self, previous):
+        """Замена подписок на одноимённые из previous вместе с состоянием."""
+        for key in self._subscriptions:
+            subscription = previous.get(*key)
+            if subscription is not None:
+                self._subscriptions[key] = subscription
+        return self
+
+    def select(self, predicate):
+        """Новый реестр из подписок этого реестра, прошедших отбор."""
+        registry = SubscriptionRegistry()
+        for key, subscription in self._subscriptions.items():
+            if predicate(subscription):
+                registry._subscriptions[key] = subscription
+        return registry
+
+    def __iter__(self):
+        """Обход снимка подписок, устойчивый к изменению реестра."""
+        return iter(list(self._subscriptions.values()))
+
+    def __len__(self):
+        """Количество подписок."""
+        return len(self._subscriptions)
+
+    def __contains__(self, key):
+        """Проверка наличия подписки по ключу (токен, чат)."""
+        return key in self._subscriptions
+
+
+def read_subscriptions(path):
+    """Чтение пар (токен, чат) из JSON-файла подписок."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            items = json.load(file)
+    except (OSError, ValueError) as error:
+        raise ValueError(
+            SUBSCRIPTIONS_FILE_ERROR.format(path=path, error=error)
+        )
+    if not isinstance(items, list):
+        raise ValueError(SUBSCRIPTIONS_FILE_ERROR.format(
+            path=path, error=type(items)
+        ))
+    pairs = []
+    for item in items:
+        try:
+            pairs.append((item['token'], item['chat_id']))
+        except (KeyError, TypeError):
+            raise ValueError(SUBSCRIPTION_FIELDS_ERROR.format(item=item))
+    return pairs
@@ -0,0 +1,74 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+NUMBERS = re.compile(r'\d+')
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: класс и текст без чисел (времён, кодов, id)."""
+    normalized = NUMBERS.sub('#', str(error))
+    return hashlib.blake2b(
+        f'{type(error).__name__}:{normalized}'.encode(), digest_size=8
+    ).hexdigest()
+
+
+class ErrorSuppressor:
+    """Подавление повторных уведомлений об ошибках с периодической сводкой.
+
+    Первая ошибка с данным отпечатком для получателя отправляется сразу,
+    повторы в течение window секунд только подсчитываются. По истечении
+    окна digests() отдаёт сводку по подавленным повторам и начинает новое
+    окно, до сводки повторы продолжают подсчитываться. Записи без повторов
+    за окно удаляются, а общее число записей ограничено limit, так что
+    память не растёт с числом чатов.
+    """
+
+    def __init__(self, window=3600, limit=100000, clock=time.monotonic):
+        """Подавление с окном в секундах и пределом числа записей."""
+        self.window = window
+        self.limit = limit
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def should_send(self, recipient, error_fingerprint, text):
+        """Нужно ли отправлять уведомление об ошибке сейчас."""
+        key = (recipient, error_fingerprint)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry[1] or now - entry[0] < self.window
+            ):
+                entry[1] += 1
+                entry[2] = text
+                return False
+            self._entries[key] = [now, 0, text]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.limit:
+                self._entries.popitem(last=False)
+            return True
+
+    def digests(self):
+        """Сводки по окнам, которые истекли: (получатель, повторов, текст)."""
+        now = self.clock()
+        digests = []
+        with self._lock:
+            while self._entries:
+                key, entry = next(iter(self._entries.items()))
+                if now - entry[0] < self.window:
+                    break
+                if not entry[1]:
+                    del self._entries[key]
+                    continue
+                digests.append((key[0], entry[1], entry[2]))
+                entry[0], entry[1] = now, 0
+                self._entries.move_to_end(key)
+        return digests
+
+    def __len__(self):
+        """Число отслеживаемых пар (получатель, отпечаток)."""
+        return len(self._entries)
@@ -0,0 +1,120 @@
+import string
+
+FORMATTER = string.Formatter()
+TEMPLATE_ERROR = 'Некорректный шаблон {name}: {error}'
+TEMPLATE_FIELDS_ERROR = ('Шаблон {name} содержит поля {fields}, '
+                         'ожидались {expected}')
+FIELD_ERROR = 'поддерживаются только именованные поля без формата: {field}'
+LOCALE_ERROR = 'Нет набора сообщений для локали {locale}'
+
+
+def escape(text):
+    """Текст как литерал шаблона str.format."""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class Template:
+    """Шаблон str.format, разобранный один раз при создании.
+
+    Поддерживаются только именованные поля без спецификаций формата;
+    отрисовка склеивает заранее выделенные литералы со значениями полей.
+    """
+
+    __slots__ = ('text', 'fields', '_parts')
+
+    def __init__(self, text):
+        """Разбор шаблона; ValueError, если он некорректен."""
+        parts = []
+        fields = set()
+        for literal, field, spec, conversion in FORMATTER.parse(text):
+            if field is None:
+                parts.append((literal, None))
+                continue
+            if spec or conversion or not field.isidentifier():
+                raise ValueError(FIELD_ERROR.format(field=field))
+            parts.append((literal, field))
+            fields.add(field)
+        self.text = text
+        self.fields = frozenset(fields)
+        self._parts = tuple(parts)
+
+    def partial(self, **values):
+        """Новый шаблон, в котором часть полей подставлена заранее."""
+        text = ''
+        for literal, field in self._parts:
+            text += escape(literal)
+            if field in values:
+                text += escape(str(values[field]))
+            elif field is not None:
+                text += '{' + field + '}'
+        return Template(text)
+
+    def render(self, **values):
+        """Текст шаблона с подставленными значениями."""
+        return ''.join(
+            literal if field is None else literal + str(values[field])
+            for literal, field in self._parts
+        )
+
+
+def compile_templates(templates, fields):
+    """Разбор и проверка шаблонов по ожидаемым именам полей.
+
+    templates - словарь {имя: текст}, fields - {имя: имена полей}.
+    Возвращает {имя: Template}; ошибка в любом шаблоне - ValueError.
+    """
+    compiled = {}
+    for name, expected in fields.items():
+        try:
+            template = Template(templates[name])
+        except (KeyError, ValueError) as error:
+            raise ValueError(TEMPLATE_ERROR.format(name=name, error=error))
+        if template.fields != set(expected):
+            raise ValueError(TEMPLATE_FIELDS_ERROR.format(
+                name=name, fields=sorted(template.fields),
+                expected=sorted(expected)
+            ))
+        compiled[name] = template
+    return compiled
+
+
+def check_templates(templates, fields):
+    """Проверка шаблонов str.format без замены их разобранными.
+
+    Так проверяются шаблоны журнала и ошибок: они отрисовываются редко,
+    и str.format для них не медленнее Template.render.
+    """
+    compile_templates(templates, fields)
+
+
+class MessageCatalog:
+    """Сообщения пользователю на одном языке, разобранные заранее.
+
+    Шаблон вердикта собирается для каждого статуса один раз, так что при
+    отправке остаётся подставить только название работы.
+    """
+
+    def __init__(self, templates, fields, verdicts, statuses,
+                 verdict='VERDICT'):
+        """Набор из шаблонов, вердиктов {статус: текст} и кодов статусов."""
+        self.templates = compile_templates(templates, fields)
+        self.verdicts = tuple(
+            self.templates[verdict].partial(verdict=verdicts[status])
+            for status in statuses
+        )
+
+    def render(self, name, **values):
+        """Текст сообщения по имени шаблона."""
+        return self.templates[name].render(**values)
+
+    def verdict(self, code, name):
+        """Текст уведомления о статусе с кодом code для работы name."""
+        return self.verdicts[code].render(name=name)
+
+
+def select_catalog(catalogs, locale):
+    """Набор сообщений локали; ValueError, если его нет."""
+    try:
+        return catalogs[locale]
+    except KeyError:
+        raise ValueError(LOCALE_ERROR.format(locale=locale))
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import homework
+from subscriptions import SubscriptionRegistry
+from utils import MockResponse, MockSession, make_engine, make_registry
+
+
+class TestAsyncPoller:
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def slow_get(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return MockResponse({
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 1,
+            })
+
+        registry = make_registry(12)
+        engine = make_engine(MockSession(slow_get), registry, concurrency=3)
+
+        engine.run_cycle()
+
+        assert 1 < peak[0] <= 3
+        assert len(engine.outbox.sent) == 12
+        assert all(
+            subscription.current_timestamp == 1 for subscription in registry
+        )
+        engine.close()
+
+    def test_timeout_raises_connection_error(self, monkeypatch):
+        def hanging_get(*args, **kwargs):
+            time.sleep(0.2)
+            return MockResponse({'homeworks': [], 'current_date': 1})
+
+        monkeypatch.setattr(requests, 'get', hanging_get)
+
+        async def request():
+            return await homework.get_api_answer_async(
+                0, {'Authorization': 'OAuth token'},
+                asyncio.Semaphore(1), timeout=0.01
+            )
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(request())
+
+    def test_slow_subscription_does_not_stall_others(self):
+        def mock_get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth slow':
+                time.sleep(0.2)
+            return MockResponse({'homeworks': [], 'current_date': 1})
+
+        registry = SubscriptionRegistry()
+        slow = registry.add('slow', 1, 0)
+        fast = registry.add('fast', 2, 0)
+        engine = make_engine(MockSession(mock_get), registry, timeout=0.05)
+
+        engine.run_cycle()
+
+        assert fast.current_timestamp == 1
+        assert slow.current_timestamp == 0
+        assert slow.last_error is not None
+        engine.close()
+
+
+class TestSession:
+
+    def test_session_pool_and_retries(self):
+        session = homework.create_session(pool_size=7, retries=2, backoff=0)
+        adapter = session.get_adapter(homework.ENDPOINT)
+        assert adapter._pool_maxsize == 7
+        assert adapter.max_retries.total == 2
+        assert 503 in adapter.max_retries.status_forcelist
+        session.close()
+
+    def test_request_uses_passed_session(self, monkeypatch):
+        def forbidden_get(*args, **kwargs):
+            assert False, 'Запрос должен идти через сессию'
+
+        monkeypatch.setattr(requests, 'get', forbidden_get)
+        calls = []
+
+        def session_get(url, headers=None, params=None, **kwargs):
+            calls.append(params['from_date'])
+            return MockResponse({'homeworks': [], 'current_date': 5})
+
+        response = homework.request_api_answer(
+            3, {'Authorization': 'OAuth token'},
+            session=MockSession(session_get)
+        )
+        assert response['current_date'] == 5
+        assert calls == [3]
+
+    def test_server_error_through_session(self):
+        session = MockSession(
+            lambda *args, **kwargs: MockResponse(status_code=HTTPStatus.BAD_GATEWAY)
+        )
+        with pytest.raises(homework.ServerError):
+            homework.request_api_answer(
+                0, {'Authorization': 'OAuth token'}, session=session
+            )
@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+import pytest
+
+import homework
+import utils
+from state import MemoryStateStore
+from subscriptions import SubscriptionRegistry
+from utils import MockResponse, MockSession
+
+WINDOW = 1000
+UNTIL = 1700000000
+HOMEWORKS = [
+    {'id': 3, 'homework_name': 'hw3', 'status': 'approved',
+     'updated': UNTIL + 10},
+    {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+     'updated': UNTIL - 500},
+    {'id': 1, 'homework_name': 'hw1', 'status': 'rejected',
+     'updated': UNTIL - 2500},
+]
+
+
+def answer(from_date):
+    return {
+        'homeworks': [
+            {
+                'id': item['id'],
+                'homework_name': item['homework_name'],
+                'status': item['status'],
+                'date_updated': datetime.fromtimestamp(
+                    item['updated'], timezone.utc
+                ).strftime(homework.DATE_FORMAT),
+            }
+            for item in HOMEWORKS if item['updated'] >= from_date
+        ],
+        'current_date': UNTIL + 20,
+    }
+
+
+def answer_from_date(url, headers=None, params=None, **kwargs):
+    return MockResponse(answer(params['from_date']))
+
+
+def make_session(fail=False):
+    if fail:
+        return MockSession(MockResponse(status_code=HTTPStatus.BAD_GATEWAY))
+    return MockSession(answer_from_date)
+
+
+def from_dates(session):
+    return [params['from_date'] for params in session.params]
+
+
+@pytest.fixture(autouse=True)
+def backfill_settings(monkeypatch):
+    monkeypatch.setattr(homework, 'BACKFILL_PERIOD', 3 * WINDOW)
+    monkeypatch.setattr(homework, 'BACKFILL_WINDOW', WINDOW)
+
+
+def make_engine(session, store=None, registry=None):
+    if registry is None:
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, UNTIL)
+    engine = utils.make_engine(
+        session, SubscriptionRegistry(),
+        state_store=store or MemoryStateStore()
+    )
+    engine.assign(registry)
+    return engine
+
+
+class TestBackfill:
+
+    def test_walks_windows_without_notifications(self):
+        session = make_session()
+        engine = make_engine(session)
+        subscription = engine.registry.get('token', 1)
+        assert subscription.backfill == [UNTIL - 3 * WINDOW, UNTIL]
+        for _ in range(3):
+            assert engine.run_backfill() == 1
+        assert from_dates(session) == [
+            UNTIL - 3 * WINDOW, UNTIL - 2 * WINDOW, UNTIL - WINDOW
+        ]
+        assert subscription.backfill is None
+        assert not engine.backfills
+        assert subscription.statuses == {
+            '1': homework.STATUS_CODES['rejected'],
+            '2': homework.STATUS_CODES['reviewing'],
+        }
+        assert engine.outbox.sent == []
+        engine.close()
+
+    def test_default_is_one_request(self, monkeypatch):
+        monkeypatch.setattr(homework, 'BACKFILL_WINDOW', 0)
+        session = make_session()
+        engine = make_engine(session)
+        assert engine.run_backfill() == 1
+        assert from_dates(session) == [UNTIL - 3 * WINDOW]
+        subscription = engine.registry.get('token', 1)
+        assert subscription.backfill is None
+        assert set(subscription.statuses) == {'1', '2'}
+        engine.close()
+
+    def test_resumes_from_checkpoint(self):
+        store = MemoryStateStore()
+        engine = make_engine(make_session(), store)
+        engine.run_backfill()
+        engine.close()
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, UNTIL)
+        assert store.restore(registry) == 1
+        session = make_session()
+        engine = make_engine(session, registry=registry)
+        while engine.backfills:
+            engine.run_backfill()
+        assert from_dates(session) == [UNTIL - 2 * WINDOW, UNTIL - WINDOW]
+        assert set(registry.get('token', 1).statuses) == {'1', '2'}
+        engine.close()
+
+    def test_error_keeps_checkpoint(self):
+        engine = make_engine(make_session(fail=True))
+        engine.run_backfill()
+        subscription = engine.registry.get('token', 1)
+        assert subscription.backfill == [UNTIL - 3 * WINDOW, UNTIL]
+        assert ('token', 1) in engine.backfills
+        assert engine.outbox.sent == []
+        engine.close()
+
+    def test_live_polling_goes_first(self):
+        session = make_session()
+        engine = make_engine(session)
+        engine.step()
+        assert from_dates(session) == [UNTIL]
+        assert engine.wait_time() <= homework.BACKFILL_PAUSE
+        engine.step()
+        assert from_dates(session) == [UNTIL, UNTIL - 3 * WINDOW]
+        engine.close()
+
+    def test_polled_subscriptions_are_not_backfilled(self):
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, UNTIL)
+        subscription.checked_at = UNTIL
+        engine = make_engine(make_session(), registry=registry)
+        assert not engine.backfills
+        engine.close()
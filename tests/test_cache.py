@@ -0,0 +1,146 @@
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+
+import homework
+from cache import (CachedResponse, ResponseCache, SingleFlight,
+                   SQLiteResponseCache, cache_key)
+from subscriptions import SubscriptionRegistry
+from utils import FakeClock, MockResponse, MockSession, make_engine
+
+ANSWER = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 50,
+}
+
+
+def make_session():
+    return MockSession(
+        MockResponse(ANSWER, headers={'ETag': '"v1"', 'Server': 'nginx'}),
+        delay=0.05
+    )
+
+
+def response(body=b'{}'):
+    return CachedResponse(200, {'ETag': '"v1"'}, body)
+
+
+class TestResponseCache:
+
+    def test_ttl_and_lru(self):
+        clock = FakeClock()
+        cache = ResponseCache(10, max_entries=2, clock=clock)
+        cache.put('a', response(b'a'))
+        cache.put('b', response(b'b'))
+        assert cache.get('a').content == b'a'
+        cache.put('c', response(b'c'))
+        assert cache.get('b') is None
+        assert len(cache) == 2
+        clock.now = 10
+        assert cache.get('a') is None
+        assert cache.stats == {'hits': 1, 'shared_hits': 0, 'misses': 2}
+
+    def test_shared_tier(self, tmp_path):
+        clock = FakeClock()
+        path = tmp_path / 'cache.db'
+        first = ResponseCache(
+            10, shared=SQLiteResponseCache(path, clock=clock), clock=clock
+        )
+        second = ResponseCache(
+            10, shared=SQLiteResponseCache(path, clock=clock), clock=clock
+        )
+        key = cache_key('token', 0)
+        first.put(key, response(b'body'))
+        cached = second.get(key)
+        assert cached.content == b'body'
+        assert cached.headers == {'ETag': '"v1"'}
+        assert second.stats['shared_hits'] == 1
+        clock.now = 10
+        assert second.get(key) is None
+        first.close()
+        second.close()
+
+    def test_not_modified_for_same_etag(self):
+        cached = response().for_request({'If-None-Match': '"v1"'})
+        assert cached.status_code == HTTPStatus.NOT_MODIFIED
+        assert response().for_request({}).status_code == HTTPStatus.OK
+
+    def test_key_hides_token(self):
+        assert 'secret' not in cache_key('secret', 5)
+        assert cache_key('secret', 5) != cache_key('secret', 6)
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_result(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def function():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flights.do('key', function))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while flights.stats['leaders'] + flights.stats['shared'] < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == [1]
+        assert results == ['result'] * 5
+
+    def test_error_is_shared_and_not_kept(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError('сбой')
+
+        with pytest.raises(ValueError):
+            flights.do('key', fail)
+        assert flights.do('key', lambda: 'ok') == 'ok'
+
+
+class TestEngineCache:
+
+    def test_same_token_is_requested_once(self):
+        registry = SubscriptionRegistry()
+        for chat_id in (1, 2, 3):
+            registry.add('token', chat_id, 0)
+        session = make_session()
+        engine = make_engine(session, registry, cache=ResponseCache(60))
+        outbox = engine.outbox
+        engine.run_cycle()
+        assert len(session.headers) == 1
+        assert sorted(chat_id for chat_id, _ in outbox.sent) == [1, 2, 3]
+        engine.run_cycle()
+        assert len(session.headers) == 2
+        assert 'If-None-Match' not in session.headers[1]
+        engine.run_cycle()
+        assert len(session.headers) == 2
+        assert engine.stats['not_modified'] == 6
+        assert len(outbox.sent) == 3
+        assert engine.cache.stats['misses'] == 6
+        assert engine.cache.stats['hits'] == 3
+        engine.close()
+
+    def test_cache_from_environment_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr(homework, 'RESPONSE_CACHE_TTL', 60)
+        registry = SubscriptionRegistry()
+        engine = make_engine(make_session(), registry)
+        assert isinstance(engine.cache, ResponseCache)
+        engine.close()
+        engine = make_engine(make_session(), registry, cache=None)
+        assert engine.cache is None
+        engine.close()
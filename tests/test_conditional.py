@@ -0,0 +1,76 @@
+import json
+from http import HTTPStatus
+
+import homework
+from utils import MockResponse, MockSession, make_engine, make_registry
+
+HOMEWORKS = [{'homework_name': 'hw1', 'status': 'reviewing'}]
+
+
+class TestConditionalRequests:
+
+    def test_body_digest_ignores_current_date(self):
+        first = json.dumps({'homeworks': HOMEWORKS, 'current_date': 1})
+        second = json.dumps({'homeworks': HOMEWORKS, 'current_date': 2})
+        first_digest, first_date = homework.body_digest(first.encode())
+        second_digest, second_date = homework.body_digest(second.encode())
+        assert first_digest == second_digest
+        assert (first_date, second_date) == (1, 2)
+
+    def test_unchanged_body_is_not_decoded(self):
+        first = MockResponse({'homeworks': HOMEWORKS, 'current_date': 10})
+        second = MockResponse({'homeworks': HOMEWORKS, 'current_date': 20})
+        registry = make_registry(1, token='token')
+        subscription = registry.get('token', 0)
+        engine = make_engine(MockSession([first, second]), registry)
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert second.decoded == 0
+        assert len(engine.outbox.sent) == 1
+        assert subscription.current_timestamp == 20
+        assert engine.stats['polls'] == 2
+        assert engine.stats['unchanged'] == 1
+        engine.close()
+
+    def test_not_modified_uses_validators(self):
+        first = MockResponse(
+            {'homeworks': HOMEWORKS, 'current_date': 10},
+            headers={'ETag': '"abc"', 'Last-Modified': 'Mon, 1 Jan 2024'}
+        )
+        second = MockResponse(status_code=HTTPStatus.NOT_MODIFIED)
+        registry = make_registry(1, token='token')
+        subscription = registry.get('token', 0)
+        session = MockSession([first, second])
+        engine = make_engine(session, registry)
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert 'If-None-Match' not in session.headers[0]
+        assert session.headers[1]['If-None-Match'] == '"abc"'
+        assert session.headers[1]['If-Modified-Since'] == 'Mon, 1 Jan 2024'
+        assert second.decoded == 0
+        assert subscription.current_timestamp == 10
+        assert engine.stats['not_modified'] == 1
+        engine.close()
+
+    def test_changed_body_is_processed(self):
+        first = MockResponse({'homeworks': HOMEWORKS, 'current_date': 10})
+        second = MockResponse({
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 20,
+        })
+        engine = make_engine(
+            MockSession([first, second]), make_registry(1),
+            stream_parsing=False
+        )
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert second.decoded == 1
+        assert len(engine.outbox.sent) == 2
+        assert engine.stats['unchanged'] == 0
+        engine.close()
@@ -0,0 +1,89 @@
+import time
+
+import requests
+
+import homework
+from limits import TokenBucket
+from utils import (MockBot, MockResponse, MockSession, make_engine,
+                   make_registry)
+
+ANSWER = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 50,
+}
+
+
+class TestDeadlines:
+
+    def test_late_polls_are_deferred(self):
+        session = MockSession(MockResponse(ANSWER), delay=0.3)
+        engine = make_engine(
+            session, make_registry(3), concurrency=1, cycle_budget=0.1
+        )
+        start = time.monotonic()
+        engine.run_cycle()
+        assert time.monotonic() - start < 0.3
+        assert len(session.timeouts) == 1
+        assert session.timeouts[0] <= 0.1
+        assert engine.stats['deferred'] == 3
+        assert engine.stats['overruns'] == 1
+        assert engine.outbox.sent == []
+        assert len(engine.scheduler.pop_due()) == 3
+        engine.close()
+
+    def test_limiter_wait_past_deadline_is_not_reserved(self):
+        limiter = TokenBucket(10, 1)
+        engine = make_engine(
+            MockSession(MockResponse(ANSWER)), make_registry(40),
+            limiter=limiter, cycle_budget=0.5
+        )
+        start = time.monotonic()
+        engine.run_cycle()
+        assert time.monotonic() - start < 1
+        assert 30 <= engine.stats['deferred'] < 40
+        assert len(engine.outbox.sent) == 40 - engine.stats['deferred']
+        assert limiter.reserve(max_delay=0.15) is not None
+        engine.close()
+
+    def test_polls_within_budget(self):
+        session = MockSession(MockResponse(ANSWER))
+        engine = make_engine(
+            session, make_registry(3), concurrency=1, cycle_budget=5
+        )
+        engine.run_cycle()
+        assert engine.stats['deferred'] == 0
+        assert engine.stats['overruns'] == 0
+        assert len(engine.outbox.sent) == 3
+        assert all(timeout <= 5 for timeout in session.timeouts)
+        engine.close()
+
+    def test_without_budget_api_timeout_applies(self):
+        session = MockSession(MockResponse(ANSWER))
+        engine = make_engine(
+            session, make_registry(1), concurrency=1, cycle_budget=0,
+            timeout=7
+        )
+        engine.run_cycle()
+        assert session.timeouts == [7]
+        engine.close()
+
+    def test_get_api_answer_has_timeout(self, monkeypatch):
+        timeouts = []
+
+        def mock_get(*args, timeout=None, **kwargs):
+            timeouts.append(timeout)
+            return MockResponse(ANSWER)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        homework.get_api_answer(0)
+        assert timeouts == [homework.API_TIMEOUT]
+
+    def test_send_has_timeout(self):
+        bot = MockBot()
+        homework.deliver_message(bot, 1, 'text')
+        assert bot.kwargs == [{'timeout': homework.SEND_TIMEOUT}]
+
+    def test_webhook_has_send_timeout(self, monkeypatch):
+        monkeypatch.setattr(homework, 'NOTIFY_WEBHOOK_URL', 'http://hook')
+        send, _ = homework.create_sink('webhook', None)
+        assert send.__self__.timeout == homework.SEND_TIMEOUT
@@ -0,0 +1,157 @@
+from http import HTTPStatus
+
+import homework
+from limits import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, TokenBucket
+from utils import (FakeClock, MockResponse, MockSession, make_engine,
+                   make_registry)
+
+
+class TestTokenBucket:
+
+    def test_reserve_returns_delay(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, 2, clock=clock)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5
+        assert bucket.reserve() == 1
+        clock.now = 1
+        assert bucket.reserve() == 0.5
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_recovers(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(3, reset_timeout=10, clock=clock)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.metrics()['opened'] == 1
+        assert breaker.metrics()['rejected'] == 2
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now = 15
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(2, clock=FakeClock())
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+
+class TestReserveWithDeadline:
+
+    def test_too_long_wait_takes_no_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, 1, clock=clock)
+        assert bucket.reserve(max_delay=1) == 0
+        assert bucket.reserve(max_delay=0.05) is None
+        assert bucket.tokens == 0
+        assert bucket.reserve(max_delay=0.5) == 0.1
+        assert bucket.reserve(max_delay=0) is None
+        assert bucket.tokens == -1
+
+
+class TestSharedLimit:
+
+    def test_limit_is_split_between_processes(self):
+        limiter = homework.create_limiter(10, 20, shares=4)
+        assert limiter.rate == 2.5
+        assert limiter.capacity == 5
+        assert homework.create_limiter(10, 2, shares=4).capacity == 1
+        assert homework.create_limiter(0, 20, shares=4) is None
+
+    def test_notification_rates_are_split(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'NOTIFY_WEBHOOK_URL', 'http://hook')
+        monkeypatch.setattr(homework, 'NOTIFY_FILE',
+                            str(tmp_path / 'notifications.jsonl'))
+        monkeypatch.setattr(homework, 'NOTIFY_SINKS',
+                            ['telegram', 'webhook', 'file'])
+        engine = make_engine(MockSession(), make_registry(1),
+                             outbox=None, shares=4)
+        outboxes = engine.outbox.outboxes
+        assert outboxes['telegram'].bucket.rate == homework.TELEGRAM_RATE / 4
+        assert outboxes['webhook'].bucket.rate == (
+            homework.NOTIFY_WEBHOOK_RATE / 4
+        )
+        assert outboxes['file'].bucket.rate == 1000
+        engine.close()
+
+    def test_reload_keeps_share(self, monkeypatch):
+        monkeypatch.setattr(homework, 'API_RATE', 12)
+        monkeypatch.setattr(homework, 'API_BURST', 6)
+        engine = make_engine(MockSession(), make_registry(1),
+                             shares=3)
+        assert engine.limiter.rate == 4
+        monkeypatch.setattr(homework, 'API_RATE', 30)
+        engine.configure()
+        assert engine.limiter.rate == 10
+        assert engine.limiter.capacity == 2
+        engine.close()
+
+
+class TestEngineBreaker:
+
+    def test_open_breaker_stops_requests_and_notifications(self):
+        session = MockSession(
+            MockResponse(status_code=HTTPStatus.SERVICE_UNAVAILABLE)
+        )
+        engine = make_engine(
+            session, make_registry(3), concurrency=1,
+            breaker=CircuitBreaker(2, reset_timeout=60, clock=FakeClock())
+        )
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert session.calls == 2
+        assert len(engine.outbox.sent) == 2
+        assert engine.breaker.state == OPEN
+        assert engine.breaker.metrics()['rejected'] == 4
+        engine.close()
+
+    def test_client_errors_do_not_open_breaker(self):
+        session = MockSession(
+            MockResponse(status_code=HTTPStatus.UNAUTHORIZED)
+        )
+        engine = make_engine(
+            session, make_registry(3), concurrency=1,
+            breaker=CircuitBreaker(2, reset_timeout=60, clock=FakeClock())
+        )
+        engine.run_cycle()
+        assert session.calls == 3
+        assert engine.breaker.state == CLOSED
+        assert len(engine.outbox.sent) == 3
+        engine.close()
+
+    def test_too_many_requests_opens_breaker(self):
+        session = MockSession(
+            MockResponse(status_code=HTTPStatus.TOO_MANY_REQUESTS)
+        )
+        engine = make_engine(
+            session, make_registry(3), concurrency=1,
+            breaker=CircuitBreaker(2, reset_timeout=60, clock=FakeClock())
+        )
+        engine.run_cycle()
+        assert session.calls == 2
+        assert engine.breaker.state == OPEN
+        engine.close()
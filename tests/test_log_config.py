@@ -0,0 +1,76 @@
+import json
+import logging
+
+import pytest
+
+from log_config import JsonFormatter, RepeatFilter, setup_logging
+from utils import FakeClock
+
+
+def make_record(message, level=logging.ERROR, **extra):
+    record = logging.makeLogRecord(dict(
+        name='homework', levelno=level, levelname=logging.getLevelName(level),
+        msg=message, **extra
+    ))
+    return record
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogConfig:
+
+    def test_repeat_filter_suppresses_similar_errors(self):
+        clock = FakeClock()
+        repeat_filter = RepeatFilter(window=60, burst=1, clock=clock)
+        assert repeat_filter.filter(make_record('Сбой: from_date=100'))
+        assert not repeat_filter.filter(make_record('Сбой: from_date=200'))
+        assert not repeat_filter.filter(make_record('Сбой: from_date=300'))
+        assert repeat_filter.filter(make_record('Другой сбой'))
+        assert repeat_filter.filter(
+            make_record('Сбой: from_date=300', level=logging.INFO)
+        )
+        clock.now = 60
+        record = make_record('Сбой: from_date=400')
+        assert repeat_filter.filter(record)
+        assert 'повторилось ещё 2 раз' in record.getMessage()
+
+    def test_json_formatter_keeps_context(self):
+        record = make_record('Сообщение', chat_id=42)
+        data = json.loads(JsonFormatter().format(record))
+        assert data['message'] == 'Сообщение'
+        assert data['level'] == 'ERROR'
+        assert data['chat_id'] == 42
+
+    def test_setup_logging_through_queue(self, tmp_path, root_logger):
+        path = tmp_path / 'main.log'
+        listener = setup_logging(
+            str(path), level=logging.INFO, json_format=True, max_bytes=1000
+        )
+        logger = logging.getLogger('homework')
+        logger.info('Первое', extra={'chat_id': 1})
+        logger.debug('Скрытое')
+        listener.stop()
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])['chat_id'] == 1
+
+    def test_setup_logging_rotates_file(self, tmp_path, root_logger):
+        path = tmp_path / 'main.log'
+        setup_logging(
+            str(path), use_queue=False, max_bytes=200, backup_count=2
+        )
+        for number in range(20):
+            logging.getLogger('homework').info('строка %s', number)
+        assert (tmp_path / 'main.log.1').exists()
+        assert not (tmp_path / 'main.log.3').exists()
@@ -0,0 +1,82 @@
+import urllib.request
+from http import HTTPStatus
+
+import homework
+import metrics
+from utils import MockResponse, MockSession, make_engine, make_registry
+
+
+class TestMetrics:
+
+    def test_counter_with_labels(self):
+        registry = metrics.MetricsRegistry()
+        counter = metrics.Counter(
+            'errors_total', 'Ошибки', labels=('type',), registry=registry
+        )
+        counter.inc(type='ValueError')
+        counter.inc(2, type='ValueError')
+        counter.inc(type='Key"Error')
+        assert counter.value(type='ValueError') == 3
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{type="ValueError"} 3' in text
+        assert 'errors_total{type="Key\\"Error"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.MetricsRegistry()
+        histogram = metrics.Histogram(
+            'latency_seconds', 'Задержка', buckets=(0.1, 1),
+            registry=registry
+        )
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(value)
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1"} 3' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+        assert 'latency_seconds_count 4' in lines
+
+    def test_callback_metric(self):
+        registry = metrics.MetricsRegistry()
+        metrics.CallbackMetric(
+            'depth', 'Глубина', lambda: 7, registry=registry
+        )
+        metrics.CallbackMetric(
+            'polls_total', 'Опросы', lambda: {'unchanged': 2}, 'counter',
+            'result', registry=registry
+        )
+        text = registry.render()
+        assert 'depth 7' in text
+        assert 'polls_total{result="unchanged"} 2' in text
+
+    def test_metrics_server(self):
+        registry = metrics.MetricsRegistry()
+        metrics.Counter('up_total', 'Работает', registry=registry).inc()
+        server = metrics.start_metrics_server(0, registry=registry)
+        port = server.server_address[1]
+        try:
+            with urllib.request.urlopen(
+                f'http://127.0.0.1:{port}/metrics'
+            ) as response:
+                assert b'up_total 1' in response.read()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_engine_records_errors_and_latency(self):
+        engine = make_engine(
+            MockSession(MockResponse(status_code=HTTPStatus.BAD_GATEWAY)),
+            make_registry(1)
+        )
+        errors = homework.POLL_ERRORS.value(type='ServerError')
+        requests = homework.API_LATENCY.count
+        engine.run_cycle()
+        assert homework.POLL_ERRORS.value(type='ServerError') == errors + 1
+        assert homework.API_LATENCY.count == requests + 1
+
+        exported = metrics.MetricsRegistry()
+        engine.register_metrics(exported)
+        text = exported.render()
+        assert 'homework_polls_total{result="polls"} 1' in text
+        assert 'homework_breaker{field="state"} 0' in text
+        engine.close()
@@ -0,0 +1,113 @@
+import threading
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from outbox import Outbox
+
+
+class FakeTime:
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, delay):
+        with self.lock:
+            if delay:
+                self.sleeps.append(delay)
+                self.now += delay
+
+
+class FlakySend:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def __call__(self, chat_id, text):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def make_outbox(send, fake_time, **kwargs):
+    settings = dict(
+        workers=1, rate=1000, chat_interval=1, retries=2, backoff=1,
+        clock=fake_time.clock, sleep=fake_time.sleep,
+    )
+    settings.update(kwargs)
+    return Outbox(send, **settings)
+
+
+class TestOutbox:
+
+    def test_pending_messages_of_chat_are_coalesced(self):
+        send = FlakySend()
+        outbox = make_outbox(send, FakeTime(), separator='|')
+        for text in ('a', 'b', 'c'):
+            outbox.put(1, text)
+        outbox.put(2, 'd')
+        assert outbox.depth == 4
+        outbox.start().close()
+        assert send.sent == [(1, 'a|b|c'), (2, 'd')]
+        assert outbox.stats['coalesced'] == 2
+        assert outbox.depth == 0
+
+    def test_coalescing_respects_limit(self):
+        send = FlakySend()
+        outbox = make_outbox(send, FakeTime(), limit=5, separator='|')
+        for text in ('aa', 'bb', 'cc'):
+            outbox.put(1, text)
+        outbox.start().close()
+        assert send.sent == [(1, 'aa|bb'), (1, 'cc')]
+
+    def test_chat_interval_between_sends(self):
+        send = FlakySend()
+        fake_time = FakeTime()
+        outbox = make_outbox(send, fake_time, limit=1, chat_interval=2)
+        outbox.put(1, 'a')
+        outbox.put(1, 'b')
+        outbox.start().close()
+        assert send.sent == [(1, 'a'), (1, 'b')]
+        assert fake_time.sleeps == [2]
+
+    def test_retry_after_is_honored(self):
+        send = FlakySend([RetryAfter(7)])
+        fake_time = FakeTime()
+        outbox = make_outbox(send, fake_time)
+        outbox.put(1, 'a')
+        outbox.start().close()
+        assert send.sent == [(1, 'a')]
+        assert fake_time.sleeps == [7]
+        assert outbox.stats['retry_after'] == 1
+
+    def test_network_errors_retried_with_backoff(self):
+        errors = []
+        send = FlakySend([TimedOut(), NetworkError('x'), NetworkError('y')])
+        fake_time = FakeTime()
+        outbox = make_outbox(
+            send, fake_time,
+            on_error=lambda *args: errors.append(args)
+        )
+        outbox.put(1, 'a')
+        outbox.start().close()
+        assert send.sent == []
+        assert fake_time.sleeps == [1, 2]
+        assert len(errors) == 1
+        assert errors[0][:2] == (1, 'a')
+        assert outbox.stats['failed'] == 1
+
+    def test_bad_request_is_not_retried(self):
+        send = FlakySend([BadRequest('chat not found')])
+        fake_time = FakeTime()
+        outbox = make_outbox(send, fake_time)
+        outbox.put(1, 'a')
+        outbox.put(2, 'b')
+        outbox.start().close()
+        assert send.sent == [(2, 'b')]
+        assert fake_time.sleeps == []
+        assert outbox.stats['failed'] == 1
@@ -0,0 +1,184 @@
+import gzip
+import json
+
+import pytest
+import requests
+
+import homework
+from replay import (RecordingSession, ReplaySession, SimulatedClock, drive,
+                    read_records, token_key)
+from utils import MockResponse, MockSession
+
+
+def answer(status, current_date):
+    return {
+        'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': status}],
+        'current_date': current_date,
+    }
+
+
+def record(path, clock, answers):
+    session = RecordingSession(MockSession(answers), path, clock=clock.time)
+    headers = {'Authorization': 'OAuth secret-token'}
+    for _ in answers:
+        try:
+            session.get(homework.ENDPOINT, headers=headers,
+                        params={'from_date': 0})
+        except ConnectionError:
+            pass
+        clock.sleep(100)
+    session.close()
+
+
+class TestRecording:
+
+    def test_records_are_redacted_and_readable(self, tmp_path):
+        path = tmp_path / 'recording.jsonl.gz'
+        record(path, SimulatedClock(1000), [
+            MockResponse(answer('reviewing', 1), headers={'ETag': '"v1"'}),
+            ConnectionError('сеть недоступна'),
+        ])
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            assert 'secret-token' not in file.read()
+        records = list(read_records(path))
+        key = token_key({'Authorization': 'OAuth secret-token'})
+        assert [item['key'] for item in records] == [key, key]
+        assert records[0]['t'] == 1000
+        assert records[0]['etag'] == '"v1"'
+        assert json.loads(records[0]['body']) == answer('reviewing', 1)
+        assert records[1]['error'] == 'сеть недоступна'
+
+    def test_unclosed_recording_is_readable(self, tmp_path):
+        path = tmp_path / 'recording.jsonl.gz'
+        clock = SimulatedClock(0)
+        session = RecordingSession(MockSession([
+            MockResponse(answer('reviewing', number))
+            for number in range(50)
+        ]), path, clock=clock.time)
+        for _ in range(50):
+            session.get(homework.ENDPOINT, headers={
+                'Authorization': 'OAuth token'
+            }, params={'from_date': 0})
+        data = path.read_bytes()
+        assert data
+        assert len(list(read_records(path))) == 50
+        path.write_bytes(data[:len(data) // 2])
+        records = list(read_records(path))
+        assert 0 < len(records) < 50
+        assert [record['body'] for record in records] == [
+            json.dumps(answer('reviewing', number))
+            for number in range(len(records))
+        ]
+
+    def test_replay_follows_virtual_time(self):
+        clock = SimulatedClock(0)
+        session = ReplaySession([
+            {'t': 100, 'key': 'k', 'status': 200, 'etag': '"b"',
+             'body': '{"b": 1}'},
+            {'t': 0, 'key': 'k', 'status': 200, 'etag': '"a"',
+             'body': '{"a": 1}'},
+            {'t': 200, 'key': 'k', 'error': 'обрыв'},
+        ], clock)
+        headers = {'Authorization': 'OAuth k'}
+        assert session.get('url', headers=headers).json() == {'a': 1}
+        clock.sleep(150)
+        assert session.get('url', headers=headers).json() == {'b': 1}
+        assert session.get('url', headers=dict(
+            headers, **{'If-None-Match': '"b"'}
+        )).status_code == 304
+        clock.sleep(100)
+        with pytest.raises(requests.ConnectionError):
+            session.get('url', headers=headers)
+        assert session.requests == 4
+
+
+class TestReplayEngine:
+
+    def test_dedup_over_recorded_hours(self, tmp_path):
+        path = tmp_path / 'recording.jsonl.gz'
+        clock = SimulatedClock(0)
+        record(path, clock, [
+            MockResponse(answer('reviewing', 100)),
+            MockResponse(answer('reviewing', 200)),
+            MockResponse(status_code=502),
+            MockResponse(status_code=502),
+            MockResponse(answer('approved', 500)),
+        ])
+        records = list(read_records(path))
+        clock = SimulatedClock(records[0]['t'])
+        engine = homework.create_replay_engine(
+            records, clock, scheduler=homework.create_scheduler(
+                clock=clock.monotonic, idle_interval=10, min_interval=10,
+                reviewing_interval=10, max_interval=10, jitter=0
+            )
+        )
+        drive(engine, clock, 2 * 3600)
+        engine.close()
+        messages = [message for _, _, message in engine.outbox.sent]
+        assert len(messages) == 4
+        assert messages[0] == homework.format_verdict(
+            'hw', homework.STATUS_CODES['reviewing']
+        )
+        assert messages[1].startswith(
+            homework.MESSAGES.render('MAIN_ERROR', error='')
+        )
+        assert messages[2] == homework.format_verdict(
+            'hw', homework.STATUS_CODES['approved']
+        )
+        assert messages[3].startswith(homework.MESSAGES.render(
+            'ERROR_DIGEST', minutes=60, count=6, error=''
+        ))
+        assert engine.session.requests > 600
+
+    def test_replays_with_same_seed_match(self):
+        records = []
+        for number in range(5):
+            for hour in range(6):
+                status = ('reviewing', 'rejected', 'approved')[
+                    (hour + number) % 3
+                ]
+                records.append({
+                    't': hour * 3600, 'key': f'key{number}', 'status': 200,
+                    'body': json.dumps(answer(status, hour * 3600)),
+                })
+                records.append({
+                    't': hour * 3600 + 1800, 'key': f'key{number}',
+                    'error': 'обрыв',
+                })
+
+        def replay(seed):
+            clock = SimulatedClock(0)
+            engine = homework.create_replay_engine(records, clock, seed=seed)
+            drive(engine, clock, 6 * 3600)
+            engine.close()
+            return engine.outbox.sent, engine.session.requests
+
+        first = replay(1)
+        assert first[0]
+        assert replay(1) == first
+        assert replay(2) != first
+
+    def test_cache_follows_virtual_clock(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'RESPONSE_CACHE_TTL', 60)
+        monkeypatch.setattr(
+            homework, 'RESPONSE_CACHE_DB', str(tmp_path / 'cache.db')
+        )
+        records = [
+            {'t': number * 600, 'key': 'key', 'status': 200,
+             'body': json.dumps(answer(
+                 ('reviewing', 'rejected')[number % 2], number * 600
+             ))}
+            for number in range(10)
+        ]
+        clock = SimulatedClock(0)
+        engine = homework.create_replay_engine(
+            records, clock, scheduler=homework.create_scheduler(
+                clock=clock.monotonic, idle_interval=300, min_interval=300,
+                reviewing_interval=300, max_interval=300, jitter=0
+            )
+        )
+        drive(engine, clock, 9 * 600 + 1)
+        engine.close()
+        assert len(engine.outbox.sent) == 10
+        assert engine.cache.stats['hits'] == 0
+        assert not (tmp_path / 'cache.db').exists()
@@ -0,0 +1,119 @@
+from scheduler import AdaptiveScheduler
+from utils import (FakeClock, MockResponse, MockSession, make_engine,
+                   make_registry)
+
+REVIEWING = MockResponse({
+    'homeworks': [{'homework_name': 'hw', 'status': 'reviewing'}]
+})
+
+
+def make_scheduler(clock, **kwargs):
+    settings = dict(
+        idle_interval=600, min_interval=60, reviewing_interval=180,
+        max_interval=3600, jitter=0, clock=clock,
+    )
+    settings.update(kwargs)
+    return AdaptiveScheduler(**settings)
+
+
+class TestAdaptiveScheduler:
+
+    def test_intervals_follow_activity(self):
+        scheduler = make_scheduler(FakeClock())
+        assert scheduler.reschedule('a') == 600
+        assert scheduler.reschedule('a') == 1200
+        assert scheduler.reschedule('a') == 2400
+        assert scheduler.reschedule('a') == 3600
+        assert scheduler.reschedule('a') == 3600
+        assert scheduler.reschedule('a', changed=True) == 60
+        assert scheduler.reschedule('a', reviewing=True) == 180
+        assert scheduler.reschedule('a') == 360
+
+    def test_jitter_spreads_due_time(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, jitter=0.5, rand=lambda: 1)
+        scheduler.reschedule('a', changed=True)
+        assert scheduler.wait_time() == 90
+
+    def test_pop_due_in_time_order(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.add('late', due=30)
+        scheduler.add('early', due=10)
+        scheduler.add('later', due=100)
+        clock.now = 50
+        assert scheduler.pop_due() == ['early', 'late']
+        assert scheduler.wait_time() == 50
+        assert len(scheduler) == 1
+
+    def test_reschedule_replaces_pending_entry(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.add('a')
+        scheduler.reschedule('a', changed=True)
+        assert scheduler.pop_due() == []
+        clock.now = 60
+        assert scheduler.pop_due() == ['a']
+
+    def test_budget_limits_polls(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, budget=2)
+        for key in 'abc':
+            scheduler.add(key)
+        assert scheduler.pop_due() == ['a', 'b']
+        assert scheduler.wait_time() == 1800
+        clock.now = 1800
+        assert scheduler.pop_due() == ['c']
+
+    def test_sync_drops_removed_keys(self):
+        scheduler = make_scheduler(FakeClock())
+        scheduler.sync(['a', 'b'])
+        scheduler.sync(['b', 'c'])
+        assert sorted(scheduler.pop_due()) == ['b', 'c']
+
+    def test_pop_due_limit_keeps_rest_due(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        for key, due in (('a', 3), ('b', 1), ('c', 2)):
+            scheduler.add(key, due)
+        clock.now = 5
+        assert scheduler.pop_due(limit=2) == ['b', 'c']
+        assert scheduler.wait_time() == 0
+        assert scheduler.pop_due(limit=2) == ['a']
+
+
+class TestEngineSchedule:
+
+    def test_run_due_polls_only_due_subscriptions(self):
+        clock = FakeClock()
+        registry = make_registry(1)
+        session = MockSession(REVIEWING)
+        engine = make_engine(
+            session, registry, scheduler=make_scheduler(clock)
+        )
+        engine.scheduler.sync(s.key for s in registry)
+
+        assert engine.run_due() == 1
+        assert engine.run_due() == 0
+        assert engine.scheduler.wait_time() == 60
+        clock.now = 60
+        assert engine.run_due() == 1
+        assert engine.scheduler.wait_time() == 180
+        assert session.calls == 2
+        engine.close()
+
+    def test_step_limit_polls_in_batches(self):
+        registry = make_registry(5)
+        session = MockSession(REVIEWING)
+        engine = make_engine(
+            session, registry, scheduler=make_scheduler(FakeClock())
+        )
+        engine.scheduler.sync(s.key for s in registry)
+
+        assert engine.step(2) == 2
+        assert engine.wait_time() == 0
+        assert engine.step(2) == 2
+        assert engine.step(2) == 1
+        assert engine.step(2) == 0
+        assert session.calls == 5
+        engine.close()
@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import homework
+from sharding import RELOAD, HashRing, Supervisor
+from state import MemoryStateStore
+from utils import make_engine, make_registry
+
+CONTEXT = multiprocessing.get_context('fork')
+ASSIGNMENTS = CONTEXT.Queue()
+
+
+def echo_worker(shard, live_shards, control, health):
+    ASSIGNMENTS.put((shard, live_shards))
+    while True:
+        health.put((shard, os.getpid(), time.time(), 0, 0))
+        try:
+            live_shards = control.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        if live_shards is None:
+            return
+        ASSIGNMENTS.put((shard, live_shards))
+
+
+def stuck_worker(shard, live_shards, control, health):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while True:
+        time.sleep(0.05)
+
+
+class TestHashRing:
+
+    def test_removing_node_moves_only_its_keys(self):
+        keys = [f'key{number}' for number in range(2000)]
+        before = {key: HashRing(range(4)).node_for(key) for key in keys}
+        assert set(before.values()) == {0, 1, 2, 3}
+        ring = HashRing([0, 1, 3])
+        after = {key: ring.node_for(key) for key in keys}
+        for key in keys:
+            if before[key] != 2:
+                assert after[key] == before[key]
+            assert after[key] != 2
+
+    def test_empty_ring(self):
+        assert HashRing().node_for('key') is None
+
+
+class TestShardRegistry:
+
+    def test_shards_partition_subscriptions(self):
+        registry = make_registry(300)
+        shards = [
+            homework.shard_registry(registry, [0, 1, 2], shard)
+            for shard in range(3)
+        ]
+        keys = [
+            subscription.key for part in shards for subscription in part
+        ]
+        assert len(keys) == len(set(keys)) == 300
+        assert all(len(part) for part in shards)
+        assert homework.shard_registry(registry, [0, 1, 2], 0).get(
+            *next(iter(shards[0])).key
+        ) is registry.get(*next(iter(shards[0])).key)
+
+    def test_dynos_split_subscriptions(self):
+        registry = make_registry(100)
+        parts = [
+            homework.shard_registry(registry, [0], 0, dyno_count=2,
+                                    dyno_index=index)
+            for index in range(2)
+        ]
+        assert len(parts[0]) + len(parts[1]) == 100
+
+    def test_assign_restores_moved_state(self):
+        registry = make_registry(50)
+        store = MemoryStateStore()
+        engine = make_engine(
+            None, homework.shard_registry(registry, [0, 1], 0),
+            state_store=store
+        )
+        for subscription in homework.shard_registry(registry, [0, 1], 1):
+            subscription.current_timestamp = 777
+            store.save(subscription)
+            subscription.current_timestamp = 0
+        moved = engine.assign(homework.shard_registry(registry, [0], 0))
+        assert len(engine.registry) == 50
+        assert moved == 50 - len(homework.shard_registry(
+            registry, [0, 1], 0
+        ))
+        assert len(engine.scheduler) == 50
+        assert sorted(
+            subscription.current_timestamp
+            for subscription in engine.registry
+        ).count(777) == moved
+        engine.close()
+
+
+class TestSupervisor:
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.02)
+        return False
+
+    def test_rebalances_when_worker_dies(self):
+        supervisor = Supervisor(
+            echo_worker, 2, heartbeat_timeout=5, restart_delay=0,
+            context=CONTEXT
+        ).start()
+        assignments = []
+
+        def received(expected):
+            while True:
+                try:
+                    assignments.append(ASSIGNMENTS.get_nowait())
+                except queue.Empty:
+                    return expected in assignments
+
+        try:
+            assert self.wait_for(lambda: received((1, [0, 1])))
+            supervisor.workers[0].process.kill()
+            assert self.wait_for(
+                lambda: not supervisor.workers[0].process.is_alive()
+            )
+            supervisor.check()
+            assert supervisor.live == {1}
+            assert self.wait_for(lambda: received((1, [1])))
+            supervisor.restart_due()
+            assert supervisor.live == {0, 1}
+            assert self.wait_for(lambda: received((0, [0, 1])))
+            supervisor.check()
+            assert supervisor.workers[1].report[0] == 1
+            supervisor.reload()
+            assert self.wait_for(lambda: received((1, RELOAD)))
+        finally:
+            supervisor.stop(timeout=5)
+
+    def test_hung_worker_ignoring_sigterm_is_killed(self):
+        supervisor = Supervisor(
+            stuck_worker, 1, heartbeat_timeout=0.5, restart_delay=60,
+            context=CONTEXT, kill_timeout=0.2
+        ).start()
+        process = supervisor.workers[0].process
+        try:
+            time.sleep(0.7)
+            supervisor.check()
+            assert not process.is_alive()
+            assert supervisor.live == set()
+            supervisor.restarts = {}
+            supervisor.live = {0}
+            supervisor.spawn(0)
+            process = supervisor.workers[0].process
+            start = time.monotonic()
+            supervisor.stop(timeout=0.2)
+            assert not process.is_alive()
+            assert time.monotonic() - start < 2
+        finally:
+            if process.is_alive():
+                process.kill()
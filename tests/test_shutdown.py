@@ -0,0 +1,135 @@
+import os
+import signal
+import threading
+import time
+
+import homework
+from limits import TokenBucket
+from outbox import Outbox
+from state import MemoryStateStore
+from subscriptions import SubscriptionRegistry
+from utils import (MockBot, MockResponse, MockSession, make_engine,
+                   make_registry)
+
+ANSWER = {
+    'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+    'current_date': 50,
+}
+
+
+class TestShutdown:
+
+    def test_outbox_close_gives_up_after_timeout(self):
+        release = threading.Event()
+        outbox = Outbox(
+            lambda chat_id, text: release.wait(), workers=1, rate=1000,
+            chat_interval=0, close_timeout=0.05
+        ).start()
+        outbox.put(1, 'first')
+        outbox.put(2, 'second')
+        time.sleep(0.05)
+        assert outbox.close() == 1
+        release.set()
+
+    def test_stop_drains_outbox_and_flushes_state(self):
+        registry = make_registry(1, token='token')
+        store = MemoryStateStore()
+        bot = MockBot()
+        engine = make_engine(
+            MockSession(MockResponse(ANSWER)), registry, bot=bot,
+            state_store=store,
+            outbox=homework.create_outbox(bot, chat_interval=0)
+        )
+        thread = threading.Thread(target=engine.run)
+        thread.start()
+        while registry.get('token', 0).checked_at is None:
+            time.sleep(0.01)
+        engine.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert len(bot.sent) == 1
+        restored = make_registry(1, token='token')
+        assert store.restore(restored) == 1
+        assert restored.get('token', 0).current_timestamp == 50
+
+    def test_stop_cuts_running_cycle_short(self):
+        session = MockSession(MockResponse(ANSWER), delay=2)
+        engine = make_engine(
+            session, make_registry(20), concurrency=2,
+            limiter=TokenBucket(1000, 1000)
+        )
+        thread = threading.Thread(target=engine.run)
+        thread.start()
+        session.started.wait(timeout=5)
+        start = time.monotonic()
+        engine.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert time.monotonic() - start < 1
+        assert engine.stats['deferred'] == 20
+        assert engine.stats['polls'] == 20
+        engine.close()
+
+    def test_reload_keeps_state_and_applies_settings(self, monkeypatch):
+        for name in homework.TUNABLES:
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        monkeypatch.setenv('POLL_MIN_INTERVAL', '5')
+        monkeypatch.setenv('POLL_CONCURRENCY', '3')
+        registry = SubscriptionRegistry()
+        kept = registry.add('token', 1, 0)
+        kept.current_timestamp = 42
+        gone = registry.add('gone', 2, 0)
+        store = MemoryStateStore()
+        store.save(kept)
+        store.save(gone)
+        engine = make_engine(
+            MockSession(MockResponse(ANSWER)), registry, state_store=store
+        )
+
+        def load():
+            loaded = SubscriptionRegistry()
+            loaded.add('token', 1, 0)
+            loaded.add('new', 3, 0)
+            return loaded
+
+        engine.reload(load)
+        assert engine.registry.get('token', 1) is kept
+        assert kept.current_timestamp == 42
+        assert engine.registry.get('gone', 2) is None
+        assert store.restore([gone]) == 0
+        assert store.restore([kept]) == 1
+        assert ('new', 3) in engine.registry
+        assert len(engine.scheduler) == 2
+        assert engine.scheduler.min_interval == 5
+        assert engine.concurrency == 3
+        assert engine.executor._max_workers == 3
+        engine.close()
+
+    def test_reload_error_keeps_running_config(self):
+        engine = make_engine(
+            MockSession(MockResponse(ANSWER)), make_registry(1, token='token')
+        )
+
+        def load():
+            raise ValueError('broken subscriptions file')
+
+        engine.reload(load)
+        assert ('token', 0) in engine.registry
+        engine.close()
+
+    def test_signal_handlers(self):
+        calls = []
+        saved = {
+            signum: signal.getsignal(signum)
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+        }
+        try:
+            homework.install_signal_handlers(
+                lambda: calls.append('stop'), lambda: calls.append('reload')
+            )
+            os.kill(os.getpid(), signal.SIGHUP)
+            os.kill(os.getpid(), signal.SIGTERM)
+        finally:
+            for signum, handler in saved.items():
+                signal.signal(signum, handler)
+        assert calls == ['reload', 'stop']
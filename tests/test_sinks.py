@@ -0,0 +1,138 @@
+import json
+import threading
+from http import HTTPStatus
+
+import pytest
+
+import homework
+from outbox import Outbox
+from sinks import Fanout, FileSink, WebhookSink
+from subscriptions import SubscriptionRegistry
+from utils import MockBot, MockResponse, MockSession, MockUpdate, make_engine
+
+
+def make_outbox(send, **kwargs):
+    settings = dict(
+        workers=1, rate=1000, chat_interval=0, retries=2, backoff=0,
+    )
+    settings.update(kwargs)
+    return Outbox(send, **settings).start()
+
+
+class TestSinks:
+
+    def test_file_sink_appends_json_lines(self, tmp_path):
+        path = tmp_path / 'notifications.jsonl'
+        sink = FileSink(path, clock=lambda: 5)
+        sink.send(1, 'первое')
+        sink.send(2, 'второе')
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {'time': 5, 'chat_id': 1, 'text': 'первое'},
+            {'time': 5, 'chat_id': 2, 'text': 'второе'},
+        ]
+
+    def test_webhook_retries_server_errors_only(self):
+        session = MockSession([
+            MockResponse(status_code=HTTPStatus.SERVICE_UNAVAILABLE),
+            MockResponse(status_code=HTTPStatus.OK),
+            MockResponse(status_code=HTTPStatus.BAD_REQUEST),
+        ])
+        sink = WebhookSink('http://hook', session=session)
+        failed = []
+        outbox = make_outbox(
+            sink.send, on_error=lambda *args: failed.append(args)
+        )
+        outbox.put(1, 'a')
+        outbox.join()
+        outbox.put(2, 'b')
+        outbox.close()
+        assert session.posted == [
+            ('http://hook', {'chat_id': 1, 'text': 'a'}),
+            ('http://hook', {'chat_id': 1, 'text': 'a'}),
+            ('http://hook', {'chat_id': 2, 'text': 'b'}),
+        ]
+        assert outbox.stats['retried'] == 1
+        assert [args[:2] for args in failed] == [(2, 'b')]
+
+    def test_slow_sink_does_not_block_others(self):
+        release = threading.Event()
+        slow_sent = []
+        fast_sent = []
+
+        def slow(chat_id, text):
+            release.wait()
+            slow_sent.append((chat_id, text))
+
+        fanout = Fanout({
+            'slow': make_outbox(slow),
+            'fast': make_outbox(lambda *args: fast_sent.append(args)),
+        })
+        fanout.put(1, 'a')
+        fanout.put(2, 'b')
+        assert fanout.outboxes['fast'].join(timeout=5)
+        assert fast_sent == [(1, 'a'), (2, 'b')]
+        assert not fanout.join(timeout=0.05)
+        release.set()
+        assert fanout.close() == 0
+        assert sorted(slow_sent) == [(1, 'a'), (2, 'b')]
+        assert fanout.stats['sent'] == 4
+
+
+class TestNotifier:
+
+    def test_fanout_to_configured_sinks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'NOTIFY_FILE',
+                            str(tmp_path / 'notifications.jsonl'))
+        bot = MockBot()
+        notifier = homework.combine_outboxes(
+            homework.start_sinks(bot, ['telegram', 'file'])
+        )
+        assert isinstance(notifier, Fanout)
+        notifier.put(1, 'статус')
+        notifier.close()
+        assert bot.sent == [(1, 'статус')]
+        assert json.loads(
+            (tmp_path / 'notifications.jsonl').read_text(encoding='utf-8')
+        )['text'] == 'статус'
+
+    def test_single_sink_is_plain_outbox(self):
+        notifier = homework.combine_outboxes(
+            homework.start_sinks(MockBot(), ['telegram'])
+        )
+        assert isinstance(notifier, Outbox)
+        notifier.close()
+
+    def test_status_replies_skip_other_sinks(self, tmp_path, monkeypatch):
+        path = tmp_path / 'notifications.jsonl'
+        monkeypatch.setattr(homework, 'NOTIFY_FILE', str(path))
+        monkeypatch.setattr(homework, 'NOTIFY_SINKS', ['telegram', 'file'])
+        bot = MockBot()
+        engine = make_engine(
+            MockSession(), SubscriptionRegistry(), bot=bot, outbox=None
+        )
+        assert engine.start_replies() is engine.outbox.outboxes['telegram']
+        homework.handle_status_command(engine, MockUpdate(), None)
+        engine.close()
+        assert bot.sent == [(1, homework.STATUS_NOT_SUBSCRIBED)]
+        assert not path.exists() or path.read_text() == ''
+
+    def test_status_replies_without_telegram_sink(self, tmp_path,
+                                                  monkeypatch):
+        path = tmp_path / 'notifications.jsonl'
+        monkeypatch.setattr(homework, 'NOTIFY_FILE', str(path))
+        monkeypatch.setattr(homework, 'NOTIFY_SINKS', ['file'])
+        bot = MockBot()
+        engine = make_engine(
+            MockSession(), SubscriptionRegistry(), bot=bot, outbox=None
+        )
+        assert engine.replies is None
+        engine.start_replies()
+        homework.handle_status_command(engine, MockUpdate(), None)
+        engine.close()
+        assert bot.sent == [(1, homework.STATUS_NOT_SUBSCRIBED)]
+        assert not path.exists() or path.read_text() == ''
+
+    def test_unknown_sink(self):
+        with pytest.raises(ValueError, match='sms'):
+            homework.start_sinks(MockBot(), ['sms'])
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('telegram', 'requests', 'urllib3', 'dotenv', 'http.server')
+
+
+class TestStartup:
+
+    def test_import_has_no_heavy_dependencies(self):
+        output = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, homework; print(" ".join(sys.modules))'],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        assert [name for name in HEAVY_MODULES if name in output] == []
+
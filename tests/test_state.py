@@ -0,0 +1,85 @@
+from state import MemoryStateStore, SQLiteStateStore, state_key
+from subscriptions import SubscriptionRegistry
+from utils import (MockOutbox, MockResponse, MockSession, make_engine,
+                   make_registry)
+
+
+class TestStateStore:
+
+    def test_state_key_hides_token(self):
+        token_hash, chat_id = state_key('secret', 42)
+        assert 'secret' not in token_hash
+        assert chat_id == '42'
+
+    def test_memory_store_flushes_in_batches(self):
+        store = MemoryStateStore()
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, 5)
+        subscription.last_name = 'hw1'
+        store.save(subscription)
+        assert store.restore(SubscriptionRegistry()) == 0
+        assert store.flush() == 1
+        assert store.flush() == 0
+
+        restored = SubscriptionRegistry()
+        restored.add('token', 1, 100)
+        assert store.restore(restored) == 1
+        assert restored.get('token', 1).last_name == 'hw1'
+        assert restored.get('token', 1).current_timestamp == 5
+
+    def test_sqlite_store_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = SQLiteStateStore(path)
+        registry = SubscriptionRegistry()
+        subscription = registry.add('token', 1, 5)
+        subscription.last_error = 'error'
+        subscription.digest = b'\x00\x01'
+        store.save(subscription)
+        store.close()
+
+        store = SQLiteStateStore(path)
+        restored = SubscriptionRegistry()
+        restored.add('token', 1, 100)
+        restored.add('other', 2, 100)
+        assert store.restore(restored) == 1
+        subscription = restored.get('token', 1)
+        assert subscription.current_timestamp == 5
+        assert subscription.last_error == 'error'
+        assert subscription.digest == b'\x00\x01'
+        assert restored.get('other', 2).current_timestamp == 100
+        store.close()
+
+    def test_restart_does_not_resend_message(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        data = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 50,
+        }
+        outbox = MockOutbox()
+        for _ in range(2):
+            registry = make_registry(1)
+            store = SQLiteStateStore(path)
+            store.restore(registry)
+            engine = make_engine(
+                MockSession(MockResponse(data)), registry, state_store=store,
+                outbox=outbox
+            )
+            engine.run_cycle()
+            engine.close()
+        assert len(outbox.sent) == 1
+
+    def test_legacy_string_statuses_are_not_resent(self):
+        registry = make_registry(1)
+        subscription = registry.get('token0', 0)
+        subscription.restore_state({'statuses': {'hw1': 'approved'}})
+        engine = make_engine(MockSession(MockResponse({
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 50,
+        })), registry)
+        engine.run_cycle()
+        engine.close()
+        assert engine.outbox.sent == []
+
+    def test_subscription_has_no_instance_dict(self):
+        subscription = SubscriptionRegistry().add('token', 1, 0)
+        assert not hasattr(subscription, '__dict__')
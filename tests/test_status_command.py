@@ -0,0 +1,66 @@
+import homework
+import utils
+from subscriptions import SubscriptionRegistry
+from utils import MockResponse, MockSession, MockUpdate
+
+
+def make_engine():
+    registry = SubscriptionRegistry()
+    registry.add('token', 1, 0)
+    return utils.make_engine(
+        MockSession(MockResponse({'homeworks': [], 'current_date': 1})),
+        registry, replies=utils.MockOutbox()
+    )
+
+
+class TestStatusCommand:
+
+    def test_fresh_state_answered_from_cache(self):
+        engine = make_engine()
+        subscription = engine.registry.get('token', 1)
+        subscription.checked_at = 1000
+        subscription.last_name = 'hw1'
+        subscription.last_status = homework.STATUS_CODES['approved']
+        subscription.statuses = {
+            '1': homework.STATUS_CODES['approved'],
+            '2': homework.STATUS_CODES['reviewing'],
+        }
+        reply = homework.status_reply(engine, '1', now=1010)
+        assert homework.VERDICTS['approved'] in reply
+        assert 'Работ на проверке: 1' in reply
+        assert homework.STATUS_REFRESHING not in reply
+        assert engine.wakeups.empty()
+        assert engine.session.calls == 0
+        engine.close()
+
+    def test_stale_state_requests_poll(self):
+        engine = make_engine()
+        engine.registry.get('token', 1).checked_at = 1000
+        reply = homework.status_reply(
+            engine, 1, now=1000 + homework.STATUS_MAX_AGE + 1
+        )
+        assert homework.STATUS_REFRESHING in reply
+        assert engine.wakeups.get_nowait() == ('token', 1)
+        engine.close()
+
+    def test_unknown_chat(self):
+        engine = make_engine()
+        assert homework.status_reply(engine, 2) == (
+            homework.STATUS_NOT_SUBSCRIBED
+        )
+        engine.close()
+
+    def test_requested_poll_runs_before_schedule(self):
+        engine = make_engine()
+        subscription = engine.registry.get('token', 1)
+        engine.scheduler.sync([subscription.key])
+        engine.scheduler.reschedule(subscription.key)
+        assert engine.run_due() == 0
+        homework.handle_status_command(engine, MockUpdate(), None)
+        assert engine.replies.sent == [(1, homework.STATUS_REFRESHING)]
+        assert engine.outbox.sent == []
+        engine.wait(0)
+        assert engine.run_due() == 1
+        assert engine.session.calls == 1
+        assert subscription.checked_at is not None
+        engine.close()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import homework
+from jsonstream import JsonReader
+from utils import MockResponse, MockSession, make_engine, make_registry
+
+HOMEWORKS = [
+    {'id': 3, 'homework_name': 'hw3', 'status': 'reviewing',
+     'date_updated': '2022-01-03T00:00:00Z'},
+    {'id': 2, 'homework_name': 'hw2', 'status': 'approved',
+     'date_updated': '2022-01-02T00:00:00Z'},
+    {'id': 1, 'homework_name': 'hw1', 'status': 'rejected',
+     'date_updated': '2022-01-01T00:00:00Z'},
+]
+JAN_2 = 1641081600
+
+
+def encode(data):
+    return json.dumps(data).encode()
+
+
+class TestJsonReader:
+
+    def test_members_and_items(self):
+        reader = JsonReader(' {"a": [1, {"b": 2}], "c": "d"} ')
+        values = {}
+        for key in reader.members():
+            if key == 'a':
+                values[key] = list(reader.items())
+            else:
+                values[key] = reader.value()
+        assert values == {'a': [1, {'b': 2}], 'c': 'd'}
+
+    def test_malformed(self):
+        reader = JsonReader('{"a" 1}')
+        with pytest.raises(json.JSONDecodeError):
+            list(reader.members())
+
+
+class TestIterHomeworks:
+
+    def test_yields_in_response_order(self):
+        content = encode({'homeworks': HOMEWORKS, 'current_date': 5})
+        assert list(homework.iter_homeworks(content, 0, {})) == HOMEWORKS
+
+    def test_stops_at_cursor_without_reading_tail(self):
+        content = encode({'homeworks': HOMEWORKS[:2]})[:-2] + b', oops'
+        homeworks = homework.iter_homeworks(content, 0, {}, cursor=JAN_2 + 1)
+        assert list(homeworks) == HOMEWORKS[:1]
+
+    @pytest.mark.parametrize('data, error', [
+        ([], TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': {}}, TypeError),
+        ({'code': 'not_authenticated'}, RuntimeError),
+    ])
+    def test_validates_shape(self, data, error):
+        with pytest.raises(error):
+            list(homework.iter_homeworks(encode(data), 0, {}))
+
+    def test_engine_streams_changes_oldest_first(self):
+        registry = make_registry(1)
+        subscription = registry.get('token0', 0)
+        response = MockResponse({'homeworks': HOMEWORKS, 'current_date': 7})
+        engine = make_engine(MockSession(response), registry)
+        engine.run_cycle()
+        assert response.decoded == 0
+        assert [
+            message.split('"')[1] for _, message in engine.outbox.sent
+        ] == ['hw1', 'hw2', 'hw3']
+        assert subscription.statuses == {
+            '1': homework.STATUS_CODES['rejected'],
+            '2': homework.STATUS_CODES['approved'],
+            '3': homework.STATUS_CODES['reviewing'],
+        }
+        assert subscription.current_timestamp == 7
+        engine.close()
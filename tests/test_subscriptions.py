@@ -0,0 +1,115 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+import homework
+from subscriptions import SubscriptionRegistry
+from utils import MockResponse, MockSession, make_engine
+
+
+def make_get(answers):
+    def mock_get(url, headers=None, params=None, **kwargs):
+        token = headers['Authorization'].split(' ', 1)[1]
+        return MockResponse(answers[token])
+    return mock_get
+
+
+class TestSubscriptions:
+
+    def test_registry_add_is_idempotent(self):
+        registry = SubscriptionRegistry()
+        first = registry.add('token', 1, 100)
+        second = registry.add('token', 1, 200)
+        assert first is second
+        assert second.current_timestamp == 100
+        assert len(registry) == 1
+        assert ('token', 1) in registry
+
+    def test_registry_load(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+        ]))
+        registry = SubscriptionRegistry().load(str(path), 10)
+        assert len(registry) == 2
+        assert registry.get('b', 2).current_timestamp == 10
+        assert registry.get('a', 1).headers == {'Authorization': 'OAuth a'}
+
+    def test_registry_load_invalid(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([{'token': 'a'}]))
+        with pytest.raises(ValueError):
+            SubscriptionRegistry().load(str(path))
+
+    def test_engine_keeps_state_per_subscription(self):
+        answers = {
+            'a': {'homeworks': [{'homework_name': 'hw1',
+                                 'status': 'approved'}],
+                  'current_date': 111},
+            'b': {'homeworks': [], 'current_date': 222},
+        }
+        registry = SubscriptionRegistry()
+        registry.add('a', 1, 0)
+        registry.add('b', 2, 0)
+        engine = make_engine(MockSession(make_get(answers)), registry)
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert engine.outbox.sent == [
+            (1, homework.parse_status(answers['a']['homeworks'][0])),
+        ]
+        assert registry.get('a', 1).current_timestamp == 111
+        assert registry.get('b', 2).current_timestamp == 222
+        engine.close()
+
+    def test_engine_error_sent_once(self):
+        session = MockSession(
+            MockResponse(status_code=HTTPStatus.BAD_GATEWAY)
+        )
+        registry = SubscriptionRegistry()
+        subscription = registry.add('a', 1, 0)
+        engine = make_engine(session, registry)
+
+        engine.run_cycle()
+        engine.run_cycle()
+
+        assert len(engine.outbox.sent) == 1
+        assert subscription.last_error is not None
+        assert subscription.current_timestamp == 0
+        engine.close()
+
+    def test_engine_reports_every_transition(self):
+        answers = {'a': {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            ],
+            'current_date': 10,
+        }}
+        registry = SubscriptionRegistry()
+        subscription = registry.add('a', 1, 0)
+        engine = make_engine(MockSession(make_get(answers)), registry)
+
+        engine.run_cycle()
+        answers['a']['homeworks'][0]['status'] = 'rejected'
+        answers['a']['current_date'] = 20
+        engine.run_cycle()
+
+        first, second = answers['a']['homeworks'][::-1]
+        assert homework.MESSAGE_SEPARATOR.join(
+            text for _, text in engine.outbox.sent
+        ) == homework.MESSAGE_SEPARATOR.join([
+            homework.parse_status(first),
+            homework.VERDICT.format(
+                name='hw2', verdict=homework.VERDICTS['reviewing']
+            ),
+            homework.parse_status(second),
+        ])
+        assert subscription.statuses == {
+            '1': homework.STATUS_CODES['approved'],
+            '2': homework.STATUS_CODES['rejected'],
+        }
+        engine.close()
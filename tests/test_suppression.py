@@ -0,0 +1,80 @@
+from http import HTTPStatus
+
+import homework
+from exceptions import ServerError
+from suppression import ErrorSuppressor, fingerprint
+from subscriptions import SubscriptionRegistry
+from utils import FakeClock, MockResponse, MockSession, make_engine
+
+
+class TestFingerprint:
+
+    def test_numbers_are_ignored(self):
+        assert fingerprint(ValueError('таймаут 5 c., 1700000000')) == (
+            fingerprint(ValueError('таймаут 10 c., 1700000300'))
+        )
+
+    def test_class_and_text_matter(self):
+        assert fingerprint(ValueError('сбой')) != fingerprint(
+            ServerError('сбой')
+        )
+        assert fingerprint(ValueError('сбой')) != fingerprint(
+            ValueError('отказ')
+        )
+
+
+class TestErrorSuppressor:
+
+    def test_repeats_go_to_digest(self):
+        clock = FakeClock()
+        suppressor = ErrorSuppressor(window=60, clock=clock)
+        assert suppressor.should_send(1, 'a', 'сбой 1')
+        assert suppressor.should_send(2, 'a', 'сбой 1')
+        assert suppressor.should_send(1, 'b', 'другой сбой')
+        clock.now = 10
+        assert not suppressor.should_send(1, 'a', 'сбой 2')
+        assert not suppressor.should_send(1, 'a', 'сбой 3')
+        assert suppressor.digests() == []
+        clock.now = 60
+        assert suppressor.digests() == [(1, 2, 'сбой 3')]
+        assert len(suppressor) == 1
+        assert not suppressor.should_send(1, 'a', 'сбой 4')
+        clock.now = 120
+        assert suppressor.digests() == [(1, 1, 'сбой 4')]
+        clock.now = 180
+        assert suppressor.digests() == []
+        assert len(suppressor) == 0
+        assert suppressor.should_send(1, 'a', 'сбой 5')
+
+    def test_limit_evicts_oldest(self):
+        suppressor = ErrorSuppressor(window=60, limit=2, clock=FakeClock())
+        for chat_id in range(3):
+            suppressor.should_send(chat_id, 'a', 'сбой')
+        assert len(suppressor) == 2
+        assert suppressor.should_send(0, 'a', 'сбой')
+
+
+class TestEngineErrors:
+
+    def test_repeated_errors_are_summarized(self):
+        clock = FakeClock()
+        registry = SubscriptionRegistry()
+        registry.add('token', 1, 0)
+        engine = make_engine(
+            MockSession(MockResponse(status_code=HTTPStatus.BAD_GATEWAY)),
+            registry, suppressor=ErrorSuppressor(window=3600, clock=clock)
+        )
+        outbox = engine.outbox
+        for _ in range(4):
+            engine.run_cycle()
+        assert len(outbox.sent) == 1
+        clock.now = 3600
+        engine.run_cycle()
+        assert len(outbox.sent) == 2
+        chat_id, message = outbox.sent[1]
+        assert chat_id == 1
+        assert message.startswith(homework.MESSAGES.render(
+            'ERROR_DIGEST', minutes=60, count=4, error=''
+        ))
+        assert message.endswith(outbox.sent[0][1].split(': ', 1)[1])
+        engine.close()
@@ -0,0 +1,62 @@
+import pytest
+
+import homework
+from templates import (MessageCatalog, Template, check_templates,
+                       compile_templates, select_catalog)
+
+
+class TestTemplates:
+
+    def test_render_matches_format(self):
+        template = Template('"{message}": отправлено {{в чат}}')
+        assert template.fields == {'message'}
+        assert template.render(message='{x}') == '"{x}": отправлено {в чат}'
+
+    @pytest.mark.parametrize('text', [
+        'статус: {status}}', '{0}', '{value:>10}', '{value!r}', '{a.b}',
+    ])
+    def test_invalid_templates(self, text):
+        with pytest.raises(ValueError):
+            compile_templates({'T': text}, {'T': ('status',)})
+
+    def test_unexpected_fields(self):
+        with pytest.raises(ValueError, match='ожидались'):
+            compile_templates({'T': '{error}'}, {'T': ('message',)})
+
+    def test_check_keeps_format_strings(self):
+        templates = {'T': 'Ошибка: {error}'}
+        check_templates(templates, {'T': ('error',)})
+        assert templates['T'].format(error='x') == 'Ошибка: x'
+        with pytest.raises(ValueError, match='ожидались'):
+            check_templates(templates, {'T': ('message',)})
+
+    def test_all_constants_are_valid(self):
+        compiled = compile_templates(
+            vars(homework), homework.TEMPLATE_FIELDS
+        )
+        assert compiled['VERDICT_ERROR'].render(status='x').endswith('x')
+
+    def test_unknown_status_error(self):
+        with pytest.raises(ValueError, match='unknown'):
+            homework.parse_status(
+                {'homework_name': 'hw', 'status': 'unknown'}
+            )
+
+    def test_catalog_prebuilds_verdicts(self):
+        catalog = MessageCatalog(
+            {'VERDICT': '{name}: {verdict}'}, {'VERDICT': ('name', 'verdict')},
+            {'approved': 'ok {}', 'rejected': 'no'}, ('approved', 'rejected')
+        )
+        assert catalog.verdict(0, 'hw') == 'hw: ok {}'
+        assert catalog.verdict(1, '{hw}') == '{hw}: no'
+
+    def test_locales(self):
+        code = homework.STATUS_CODES['approved']
+        assert homework.CATALOGS['ru'].verdict(code, 'hw') == (
+            homework.VERDICT.format(
+                name='hw', verdict=homework.VERDICTS['approved']
+            )
+        )
+        assert 'Hooray' in homework.CATALOGS['en'].verdict(code, 'hw')
+        with pytest.raises(ValueError):
+            select_catalog(homework.CATALOGS, 'xx')
@@ -1,3 +1,7 @@
+import json
+import threading
+import time
+from http import HTTPStatus
 from inspect import signature
 from types import ModuleType
 
@@ -37,3 +41,134 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class MockResponse:
+    """API response stub; json() returns data and counts the calls"""
+
+    def __init__(self, data=None, status_code=HTTPStatus.OK, headers=None):
+        self.data = {} if data is None else data
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(self.data).encode()
+        self.decoded = 0
+
+    def json(self):
+        self.decoded += 1
+        return self.data
+
+
+class MockSession:
+    """HTTP session stub that records requests and returns prepared answers
+
+    answers is one response returned every time, a list of responses and
+    exceptions used in order, or a function called with the request
+    arguments.
+    """
+
+    def __init__(self, answers=None, delay=0):
+        if answers is None:
+            answers = MockResponse()
+        self.answers = (
+            list(answers) if isinstance(answers, list) else answers
+        )
+        self.delay = delay
+        self.calls = 0
+        self.headers = []
+        self.params = []
+        self.timeouts = []
+        self.posted = []
+        self.started = threading.Event()
+
+    def get(self, url, headers=None, params=None, timeout=None, **kwargs):
+        self.calls += 1
+        self.headers.append(dict(headers or {}))
+        self.params.append(params)
+        self.timeouts.append(timeout)
+        return self.answer(url, headers=headers, params=params, **kwargs)
+
+    def post(self, url, json=None, timeout=None):
+        self.posted.append((url, json))
+        self.timeouts.append(timeout)
+        return self.answer(url, json=json)
+
+    def answer(self, url, **kwargs):
+        self.started.set()
+        time.sleep(self.delay)
+        if callable(self.answers):
+            return self.answers(url, **kwargs)
+        if not isinstance(self.answers, list):
+            return self.answers
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def close(self):
+        pass
+
+
+class MockBot:
+    """Telegram bot stub that collects sent messages"""
+
+    def __init__(self):
+        self.sent = []
+        self.kwargs = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+        self.kwargs.append(kwargs)
+
+
+class MockChat:
+    id = 1
+
+
+class MockUpdate:
+    effective_chat = MockChat()
+
+
+class FakeClock:
+    """Clock stub whose time is set through the now attribute"""
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MockOutbox:
+    """Outbox stub that collects (chat_id, message) pairs instead of sending"""
+
+    depth = 0
+    stats = {}
+
+    def __init__(self):
+        self.sent = []
+
+    def put(self, chat_id, message):
+        self.sent.append((chat_id, message))
+
+    def close(self):
+        pass
+
+
+def make_registry(count, token=None, current_timestamp=0):
+    """Registry with chats 0..count-1, one token each unless token is given"""
+    from subscriptions import SubscriptionRegistry
+
+    registry = SubscriptionRegistry()
+    for chat_id in range(count):
+        registry.add(
+            token or f'token{chat_id}', chat_id, current_timestamp
+        )
+    return registry
+
+
+def make_engine(session, registry, bot=None, **kwargs):
+    """PollingEngine that queues messages into MockOutbox by default"""
+    import homework
+
+    settings = dict(session=session, outbox=MockOutbox())
+    settings.update(kwargs)
+    return homework.PollingEngine(bot, registry, **settings)